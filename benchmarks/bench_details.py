@@ -0,0 +1,134 @@
+"""Exercise the live-game detail fetcher against a local stand-in for ESPN.
+
+Usage: python benchmarks/bench_details.py [--games N] [--latency MS] [--errors PCT]
+                                          [--workers W] [--ttl S] [--polls P]
+
+Starts an HTTP server on localhost that serves fake per-game summaries
+after a delay, then runs DetailFetcher.update() once per simulated poll for
+N live games. Halfway through, a third of the games end. Prints how long
+update() took (it must never wait on the network), how many polls it took
+until every live game had a detail, and whether the ended games were
+cancelled and forgotten.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fbbot.details import DetailFetcher
+from fbbot.game import Game, GAME_STATUS_IN, GAME_STATUS_POST
+from fbbot.httpclient import HttpClient
+
+
+class StandIn(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency, errors):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), SummaryHandler)
+        self.latency = latency
+        self.errors = errors
+        self.hits = 0
+        self.rng = random.Random(0)
+        self.lock = threading.Lock()
+
+
+class SummaryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits += 1
+            fail = server.rng.random() * 100 < server.errors
+        time.sleep(server.latency)
+        gameID = parse_qs(urlsplit(self.path).query)['event'][0]
+        if fail:
+            body = b"unavailable"
+            self.send_response(503)
+        else:
+            plays = int(time.time() * 10) % 12 + 1
+            body = json.dumps({'drives': {'current': {
+                'description': "%d plays, %d yards, 2:%02d" % (plays, plays * 6, plays * 4),
+                'team': {'abbreviation': "T%s" % gameID},
+                'plays': [{'text': "Play %d of game %s" % (n, gameID)} for n in range(plays)]}}}).encode()
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def makeGames(count):
+    games = {}
+    for n in range(count):
+        gameID = str(400000000 + n)
+        games[gameID] = Game(gameID, "fbs", "2017-10-07T16:00Z", GAME_STATUS_IN, "5:00 - 2nd",
+                             "Somewhere, ST", "Home %d" % n, str(2 * n), "H%d" % n, 14,
+                             "Away %d" % n, str(2 * n + 1), "A%d" % n, 10)
+    return games
+
+
+def run(args):
+    server = StandIn(args.latency / 1000.0, args.errors)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:%d/summary?event=%%s" % server.server_address[1]
+    fetcher = DetailFetcher(HttpClient(timeout=5), url=url, workers=args.workers, ttl=args.ttl)
+
+    games = makeGames(args.games)
+    updates = []
+    complete = None
+    ended = []
+    for poll in range(args.polls):
+        if poll == args.polls // 2:
+            for gameID in list(games)[:args.games // 3]:
+                old = games[gameID]
+                games[gameID] = Game(old.id, old.league, old.date, GAME_STATUS_POST, "Final",
+                                     old.location, old.hometeam, old.homeid, old.homeabv, old.homescore,
+                                     old.awayteam, old.awayid, old.awayabv, old.awayscore)
+                ended.append(gameID)
+        start = time.perf_counter()
+        fetcher.update(games)
+        updates.append(time.perf_counter() - start)
+        if complete is None and all(fetcher.get(gameID) is not None for gameID in games):
+            complete = poll
+        time.sleep(args.interval)
+
+    leaked = [gameID for gameID in ended if fetcher.get(gameID) is not None or gameID in fetcher.inflight]
+    fetcher.shutdown()
+    server.shutdown()
+
+    print("%d live games, %d workers, %d ms server latency, %d%% errors, %d polls %.2f s apart"
+          % (args.games, args.workers, args.latency, args.errors, args.polls, args.interval))
+    print("update(): mean %.3f ms, max %.3f ms" % (sum(updates) / len(updates) * 1000, max(updates) * 1000))
+    print("Requests: %d served, %d fetched, %d errors, %d cancelled"
+          % (server.hits, fetcher.fetched, fetcher.errors, fetcher.cancelled))
+    print("Every live game had a detail after: %s" % ("poll %d" % complete if complete is not None else "never"))
+    print("Ended games still tracked: %d of %d" % (len(leaked), len(ended)))
+    return 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Run DetailFetcher against a local stand-in server.")
+    parser.add_argument("--games", type=int, default=60)
+    parser.add_argument("--latency", type=int, default=200, help="server delay per request (ms)")
+    parser.add_argument("--errors", type=int, default=5, help="percentage of requests that fail")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--ttl", type=float, default=5)
+    parser.add_argument("--polls", type=int, default=40)
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between polls")
+    return run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,57 @@
+"""Benchmark the scoreboard payload extractor against saved ESPN pages.
+
+Usage: python benchmarks/bench_extract.py page1.html [page2.html ...]
+
+For each page, times fbbot.extract.extractScoreboard against the old
+decode-and-slice approach that getGames used to do.
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fbbot.extract import findObject, extractScoreboard
+
+OLD_MARKER = 'window.espn.scoreboardData \t= '
+
+
+def oldExtract(raw):
+    scoreData = raw.decode("utf-8")
+    scoreData = scoreData[scoreData.find(OLD_MARKER) + len(OLD_MARKER):]
+    return json.loads(scoreData[:scoreData.find('};') + 1])
+
+
+def bench(path, number):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    start, end = findObject(raw)
+    print("%s: %d bytes, payload %d bytes at offset %d, %d events"
+          % (path, len(raw), end - start, start, len(extractScoreboard(raw)['events'])))
+
+    scan = timeit.timeit(lambda: findObject(raw), number=number) / number
+    new = timeit.timeit(lambda: extractScoreboard(raw), number=number) / number
+    print("  scan only:         %8.3f ms" % (scan * 1000))
+    print("  extractScoreboard: %8.3f ms" % (new * 1000))
+    try:
+        if oldExtract(raw) != extractScoreboard(raw):
+            print("  old slice:         returns a different object!")
+            return
+        old = timeit.timeit(lambda: oldExtract(raw), number=number) / number
+        print("  old slice:         %8.3f ms" % (old * 1000))
+    except ValueError as ex:
+        print("  old slice:         fails (%s)" % ex)
+
+
+def main(argv):
+    if not argv:
+        print(__doc__.strip())
+        return 1
+    for path in argv:
+        bench(path, 50)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
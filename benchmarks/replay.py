@@ -0,0 +1,222 @@
+"""Replay recorded ESPN scoreboard payloads through the cfbscores plugin.
+
+Usage: python benchmarks/replay.py RECORD_DIR [--commands N] [--seed S]
+
+RECORD_DIR is a directory written by the plugin's record_dir option. Every
+recorded payload is fed, in time order, through CFBScores.updateScores with a
+fake IRC connection, and after each poll N simulated user commands (!score,
+!line, !whatson, !closegames) are run against the plugin. Prints per-stage
+timings, announcement throughput, command latency and peak memory.
+
+Timers and TTLs inside the plugin run on the wall clock, so a replay is a
+throughput and correctness run, not a real-time re-enactment.
+"""
+import argparse
+import collections
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from pyaib.db import ObjectStore
+from pyaib.util.data import Object
+
+import plugins.cfbscores as cfbscores
+from fbbot.httpclient import HttpResponse
+from fbbot.outqueue import OutboundQueue
+from fbbot.recorder import loadRecordings, readRecording
+from fbbot.sources import decodePayload
+from fbbot.throttle import CommandThrottle
+
+LIVE_CHAN = "#replay"
+DEBUG_CHAN = "#replay-debug"
+COMMANDS = (("score", 6), ("line", 2), ("whatson", 1), ("closegames", 1))
+
+
+class ReplaySource(object):
+    '''Stands in for the score source: serves each loaded payload once, then
+    reports it unchanged. Recordings of either ESPN source are decoded.'''
+
+    name = "replay"
+
+    def __init__(self):
+        self.pending = {}
+
+    def load(self, league, body):
+        self.pending[league] = body
+
+    def fetch(self, league):
+        url = "replay:" + league
+        body = self.pending.pop(league, None)
+        if body is None:
+            return HttpResponse(url, 304, {}, None, True, 0)
+        return HttpResponse(url, 200, {}, body, False, len(body))
+
+    def decode(self, body):
+        return decodePayload(body)
+
+    def commit(self, response):
+        pass
+
+
+class FakeIrc(object):
+    def __init__(self):
+        self.sent = []
+
+    def PRIVMSG(self, target, msg):
+        self.sent.append((target, msg))
+
+
+class FakeSender(object):
+    def __init__(self, nick):
+        self.nick = nick
+
+    def __str__(self):
+        return self.nick
+
+
+class FakeMsg(object):
+    def __init__(self, nick):
+        self.sender = FakeSender(nick)
+        self.channel = None
+        self.replies = []
+
+    def reply(self, text):
+        self.replies.append(text)
+
+
+class Stages(object):
+    def __init__(self):
+        self.times = collections.OrderedDict()
+
+    def wrap(self, name, func):
+        samples = self.times.setdefault(name, [])
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+        return timed
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100.0))]
+
+
+def summarize(name, samples):
+    if not samples:
+        print("  %-14s       -" % name)
+        return
+    print("  %-14s n=%-6d total %9.1f ms  mean %7.3f ms  p50 %7.3f ms  p95 %7.3f ms  max %7.3f ms"
+          % (name, len(samples), sum(samples) * 1000, sum(samples) / len(samples) * 1000,
+             percentile(samples, 50) * 1000, percentile(samples, 95) * 1000, max(samples) * 1000))
+
+
+def makePlugin(leagues):
+    config = Object({'leagues': leagues, 'live_chans': [LIVE_CHAN], 'debug_chan': DEBUG_CHAN,
+                     'poll_freq': 20, 'inactive_freq': 60})
+
+    class Context(object):
+        db = ObjectStore(None, Object({'backend': 'sqlite', 'driver': {'sqlite': {'path': ':memory:'}}}))
+
+    plugin = cfbscores.CFBScores(Context(), config)
+    # Don't let flood pacing or command throttling hold anything back during a replay
+    plugin.outbox = OutboundQueue(rate=1e9, burst=1e9, globalRate=1e9, globalBurst=1e9)
+    plugin.throttle = CommandThrottle(userRate=1e9, userBurst=1e9, chanRate=1e9, chanBurst=1e9)
+    return plugin
+
+
+def simulateUsers(plugin, irc, rng, count, latencies):
+    teams = []
+    for game in plugin.games.values():
+        teams.extend((game.hometeam, game.awayteam, game.homeabv))
+    teams.extend(plugin.abbrv)
+    teams.append("not a team")
+    weighted = [name for name, weight in COMMANDS for _ in range(weight)]
+    for i in range(count):
+        command = rng.choice(weighted)
+        msg = FakeMsg("user%d" % rng.randint(1, 500))
+        args = rng.choice(teams).split() if command in ("score", "line") else []
+        start = time.perf_counter()
+        getattr(plugin, command)(irc, msg, command, args, {})
+        latencies[command].append(time.perf_counter() - start)
+
+
+def replay(directory, commands, seed):
+    recordings = loadRecordings(directory)
+    if not recordings:
+        print("No recordings found in %s" % directory)
+        return 1
+    leagues = sorted(set(league for _, league, _ in recordings))
+
+    tracemalloc.start()
+    irc = FakeIrc()
+    plugin = makePlugin(leagues)
+    source = plugin.source = ReplaySource()
+
+    stages = Stages()
+    plugin.getGames = stages.wrap("fetch+parse", plugin.getGames)
+    plugin.parseGames = stages.wrap("parse", plugin.parseGames)
+    source.decode = stages.wrap("extract", source.decode)
+    plugin.applyScores = stages.wrap("diff+announce", plugin.applyScores)
+    plugin.outbox.drain = stages.wrap("send", plugin.outbox.drain)
+    polls = stages.times.setdefault("poll", [])
+
+    rng = random.Random(seed)
+    latencies = collections.OrderedDict((name, []) for name, _ in COMMANDS)
+    started = time.perf_counter()
+    for when, league, path in recordings:
+        source.load(league, readRecording(path))
+        pollStart = time.perf_counter()
+        plugin.nextUpdate = 0
+        plugin.updateScores(irc, "scoreupdate")
+        while plugin.fetcher.running():
+            time.sleep(0.0005)
+        plugin.updateScores(irc, "scoreupdate")
+        polls.append(time.perf_counter() - pollStart)
+        simulateUsers(plugin, irc, rng, commands, latencies)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    announcements = sum(1 for target, _ in irc.sent if target == LIVE_CHAN)
+    announceTime = sum(stages.times["diff+announce"]) + sum(stages.times["send"])
+    first, last = recordings[0][0], recordings[-1][0]
+    print("Replayed %d payloads (%s) covering %.1f hours in %.2f s"
+          % (len(recordings), ', '.join(leagues), (last - first) / 3600.0, elapsed))
+    print("Stages:")
+    for name, samples in stages.times.items():
+        summarize(name, samples)
+    print("Announcements: %d (%.0f/s of diff+announce+send time), %d suppressed as repeats"
+          % (announcements, announcements / announceTime if announceTime else 0,
+             plugin.recentAnnounce.suppressed))
+    print("Commands (%d per poll):" % commands)
+    for name, samples in latencies.items():
+        summarize("!" + name, samples)
+    print("Memory: peak %.1f MB, final %.1f MB" % (peak / 1048576.0, current / 1048576.0))
+    return 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Replay recorded scoreboards through cfbscores.")
+    parser.add_argument("directory", help="record_dir written by the plugin")
+    parser.add_argument("--commands", type=int, default=20, help="simulated commands per poll")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for simulated users")
+    args = parser.parse_args(argv)
+    directory = os.path.abspath(args.directory)
+    # The plugin loads its data files relative to the bot's directory
+    os.chdir(ROOT)
+    return replay(directory, args.commands, args.seed)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
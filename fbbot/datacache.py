@@ -0,0 +1,98 @@
+import json
+import os
+import pickle
+import random
+
+from fbbot.teamindex import foldAliases
+
+# Bump when the layout of the cached data changes
+CACHE_VERSION = 1
+
+# Recent desktop Chrome user agents; one is picked the first time the cache
+# is built and kept from then on
+BUNDLED_USER_AGENTS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/61.0.3163.100 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_12_6) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/61.0.3163.100 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/61.0.3163.100 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 6.1; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/60.0.3112.113 Safari/537.36",
+)
+
+
+def sourceStamp(paths):
+    '''(path, mtime, size) for every source file, to tell when the cache is stale.'''
+    stamp = []
+    for path in paths:
+        st = os.stat(path)
+        stamp.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(stamp)
+
+
+class DataCache(object):
+    '''Everything the plugin loads from disk at startup, in one pickle.
+
+    The cache holds the team alias table from abbrv.json (as loaded and
+    already folded for TeamIndex) and the user agent the bot fetches with.
+    It is rebuilt when abbrv.json changes, and otherwise startup is a single
+    file read with no JSON parsing and no network access.'''
+
+    def __init__(self, path, abbrvPath="abbrv.json"):
+        self.path = path
+        self.abbrvPath = abbrvPath
+        self.rebuilt = False
+        self.data = None
+        self.stamp = None
+
+    def changed(self):
+        '''True if abbrv.json changed since the last load().'''
+        try:
+            return sourceStamp([self.abbrvPath]) != self.stamp
+        except OSError:
+            return False
+
+    def load(self):
+        '''Load the cache, rebuilding it if it is missing or stale.'''
+        # Remembered even if the load fails, so a broken file is tried once
+        stamp = self.stamp = sourceStamp([self.abbrvPath])
+        data = self._read()
+        if data is None or data.get('version') != CACHE_VERSION or data.get('sources') != stamp:
+            data = self._build(stamp, data)
+            self.rebuilt = True
+            try:
+                self._write(data)
+            except OSError as ex:
+                print("Can't write data cache %s: %s" % (self.path, ex))
+        self.data = data
+        return data
+
+    def _read(self):
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+        except Exception as ex:
+            print("Ignoring unreadable data cache %s: %s" % (self.path, ex))
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _build(self, stamp, old):
+        with open(self.abbrvPath) as f:
+            abbrv = json.load(f)
+        # Keep the user agent across rebuilds so the bot looks the same to ESPN
+        userAgent = old.get('useragent') if old else None
+        if not userAgent:
+            userAgent = random.choice(BUNDLED_USER_AGENTS)
+        return {'version': CACHE_VERSION, 'sources': stamp, 'abbrv': abbrv,
+                'aliases': foldAliases(abbrv), 'useragent': userAgent}
+
+    def _write(self, data):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
@@ -0,0 +1,54 @@
+import time
+from collections import OrderedDict
+
+
+class AnnounceDedup(object):
+    '''Remembers recently announced events so repeats can be suppressed.
+
+    Keys are hashable event identities such as (game ID, event type, status,
+    away score, home score), so a check is one dict lookup regardless of how
+    the announcement is worded. Keys expire after ttl seconds, and the oldest
+    are evicted once more than maxSize are held.'''
+
+    def __init__(self, ttl=1800, maxSize=500):
+        self.ttl = ttl
+        self.maxSize = maxSize
+        self.seen = OrderedDict()
+        self.suppressed = 0
+
+    def check(self, key, now=None):
+        '''Return True if key was announced within the TTL (and count it as
+        suppressed); otherwise remember it and return False.'''
+        if now is None:
+            now = time.time()
+        self.expire(now)
+        if key in self.seen:
+            self.suppressed += 1
+            return True
+        self.seen[key] = now
+        while len(self.seen) > self.maxSize:
+            self.seen.popitem(last=False)
+        return False
+
+    def expire(self, now):
+        # Insertion order is time order, so expired keys are at the front
+        seen = self.seen
+        while seen:
+            key, stamp = next(iter(seen.items()))
+            if now - stamp < self.ttl:
+                break
+            del seen[key]
+
+    def restore(self, entries, now=None):
+        '''Re-remember (key, time) pairs, e.g. from a snapshot, oldest first.'''
+        if now is None:
+            now = time.time()
+        for key, stamp in sorted(entries, key=lambda entry: entry[1]):
+            self.seen.pop(key, None)
+            self.seen[key] = stamp
+        while len(self.seen) > self.maxSize:
+            self.seen.popitem(last=False)
+        self.expire(now)
+
+    def __len__(self):
+        return len(self.seen)
@@ -0,0 +1,172 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fbbot.game import GAME_STATUS_IN
+
+# ESPN's per-game summary, with the drive chart
+DETAIL_URL = "http://site.api.espn.com/apis/site/v2/sports/football/college-football/summary?event=%s"
+
+
+class GameDetail(object):
+    '''Drive information for a live game, from its summary page.'''
+
+    __slots__ = ('drive', 'team', 'play', 'fetched')
+
+    def __init__(self, drive, team, play, fetched):
+        self.drive = drive
+        self.team = team
+        self.play = play
+        self.fetched = fetched
+
+
+def parseDetail(data, fetched):
+    '''Build a GameDetail from an ESPN summary document, or None if it has no
+    current drive.'''
+    try:
+        current = data['drives']['current']
+    except (KeyError, TypeError):
+        return None
+    description = current.get('description')
+    if not description:
+        return None
+    team = None
+    try:
+        team = current['team']['abbreviation']
+    except (KeyError, TypeError):
+        pass
+    play = None
+    try:
+        play = current['plays'][-1]['text']
+    except (KeyError, IndexError, TypeError):
+        pass
+    return GameDetail(description, team, play, fetched)
+
+
+class DetailFetcher(object):
+    '''Fetches summaries of live games in the background.
+
+    update() is called once per poll with the current games. It never
+    blocks: it hands games whose detail is missing or older than ttl to a
+    pool of workers threads, with at most workers fetches in flight, and
+    cancels fetches and forgets details for games that are no longer live.
+    If margin is set, only games within margin points are fetched. get()
+    returns whatever detail has arrived so far.'''
+
+    def __init__(self, http, url=DETAIL_URL, workers=4, ttl=60, margin=None):
+        self.http = http
+        self.url = url
+        self.workers = workers
+        self.ttl = ttl
+        self.margin = margin
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self._lock = threading.Lock()
+        self.details = {}
+        self.inflight = {}
+        # Games due for a fetch, waiting for a free worker
+        self.queue = []
+        self.fetched = 0
+        self.errors = 0
+        self.cancelled = 0
+
+    def wanted(self, game):
+        if game.status != GAME_STATUS_IN:
+            return False
+        return self.margin is None or abs(game.homescore - game.awayscore) <= self.margin
+
+    def update(self, games, now=None):
+        '''Start fetches for live games that need one. Returns the number started.'''
+        if now is None:
+            now = time.time()
+        live = set(gameID for gameID, game in games.items() if self.wanted(game))
+        started = 0
+        with self._lock:
+            for gameID in list(self.inflight):
+                if gameID not in live:
+                    self._cancel(gameID)
+            for gameID in list(self.details):
+                if gameID not in live:
+                    del self.details[gameID]
+            # Oldest details first, so a backlog is worked off fairly
+            due = []
+            for gameID in live:
+                if gameID in self.inflight:
+                    continue
+                detail = self.details.get(gameID)
+                if detail is None:
+                    due.append((0, gameID))
+                elif now - detail.fetched >= self.ttl:
+                    due.append((detail.fetched, gameID))
+            due.sort()
+            self.queue = [gameID for _, gameID in due]
+            while self.queue and len(self.inflight) < self.workers:
+                self._submit(self.queue.pop(0))
+                started += 1
+        return started
+
+    def get(self, gameID):
+        return self.details.get(gameID)
+
+    def cancel(self, gameID):
+        '''Stop fetching a game (e.g. because it just ended) and forget its detail.'''
+        with self._lock:
+            if gameID in self.inflight:
+                self._cancel(gameID)
+            if gameID in self.queue:
+                self.queue.remove(gameID)
+            self.details.pop(gameID, None)
+
+    def shutdown(self):
+        with self._lock:
+            self.queue = []
+            for gameID in list(self.inflight):
+                self._cancel(gameID)
+        self.pool.shutdown(wait=False)
+
+    def _submit(self, gameID):
+        self.inflight[gameID] = self.pool.submit(self._fetch, gameID)
+
+    def _cancel(self, gameID):
+        # A fetch that already started runs to completion but its result is
+        # dropped, since it's no longer in inflight when it finishes
+        future = self.inflight.pop(gameID)
+        future.cancel()
+        self.cancelled += 1
+
+    def _fetch(self, gameID):
+        with self._lock:
+            # update() holds the lock until the future is in inflight
+            future = self.inflight.get(gameID)
+        if future is None:
+            return
+        detail = None
+        failed = False
+        try:
+            resp = self.http.get(self.url % gameID)
+            if not resp.notModified:
+                detail = parseDetail(json.loads(resp.body.decode('utf-8')), time.time())
+                self.http.commit(resp)
+        except Exception as ex:
+            print("Error fetching detail for %s: %s" % (gameID, ex))
+            failed = True
+        with self._lock:
+            if self.inflight.get(gameID) is not future:
+                return
+            del self.inflight[gameID]
+            if failed:
+                self.errors += 1
+            else:
+                self.fetched += 1
+            if detail is None:
+                # Unchanged, failed, or no drive on the page (e.g. between
+                # quarters): keep what we had and try again after the TTL
+                old = self.details.get(gameID)
+                if old is not None and (failed or resp.notModified):
+                    detail = GameDetail(old.drive, old.team, old.play, time.time())
+                else:
+                    detail = GameDetail(None, None, None, time.time())
+            self.details[gameID] = detail
+            # Hand this worker the next waiting game straight away
+            if self.queue:
+                self._submit(self.queue.pop(0))
@@ -0,0 +1,77 @@
+import json
+import re
+
+SCOREBOARD_MARKER = re.compile(br'window\.espn\.scoreboardData\s*=\s*')
+
+# Everything up to and including the next brace that is not inside a JSON
+# string, written as an unrolled loop: a run of plain bytes, then any number
+# of (whole string, run of plain bytes). There is only one way to split the
+# input that way, so a page with no closing brace fails in linear time
+# instead of backtracking through every split. Applied with match() at the
+# current offset, so a failure is never retried from later offsets.
+_TOKEN = re.compile(br'[^{}"]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^{}"]*)*[{}]', re.DOTALL)
+
+
+class ExtractError(ValueError):
+    '''Raised when the embedded JSON payload can't be found in a page.'''
+
+
+def findObject(data, marker=SCOREBOARD_MARKER):
+    '''Return (start, end) of the JSON object assigned after marker in data.
+
+    data is the raw page as bytes. The page is scanned once from the marker
+    forward; nesting and string literals are respected, so a "};" inside a
+    string does not end the object early.'''
+    match = marker.search(data)
+    if match is None:
+        raise ExtractError("Marker %r not found in page (%d bytes)"
+                           % (marker.pattern.decode('ascii'), len(data)))
+    start = match.end()
+    if data[start:start + 1] != b'{':
+        raise ExtractError("Expected '{' after marker at offset %d, found %r"
+                           % (start, data[start:start + 20]))
+
+    depth = 0
+    pos = start
+    while True:
+        token = _TOKEN.match(data, pos)
+        if token is None:
+            break
+        pos = token.end()
+        if data[pos - 1] == 0x7b:  # {
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return start, pos
+    raise ExtractError("Unterminated JSON object starting at offset %d" % start)
+
+
+def extractJson(data, marker=SCOREBOARD_MARKER):
+    '''Decode and return the JSON object assigned after marker in data.
+
+    The common case is that the object is followed directly by "};", so that
+    slice is tried first. JSON only parses if the slice is exactly one whole
+    object, so a "};" that sits inside a string just fails to decode and the
+    exact boundary is then found with findObject().'''
+    match = marker.search(data)
+    if match is not None:
+        start = match.end()
+        end = data.find(b'};', start)
+        if end != -1:
+            try:
+                return json.loads(data[start:end + 1].decode('utf-8'))
+            except ValueError:
+                pass
+
+    start, end = findObject(data, marker)
+    try:
+        return json.loads(data[start:end].decode('utf-8'))
+    except ValueError as ex:
+        raise ExtractError("Invalid JSON payload at offset %d: %s" % (start, ex))
+
+
+def extractScoreboard(data):
+    '''Return the decoded window.espn.scoreboardData object from an ESPN
+    scoreboard page.'''
+    return extractJson(data, SCOREBOARD_MARKER)
@@ -0,0 +1,199 @@
+import json
+import os
+import socket
+import threading
+import time
+
+from fbbot.game import Game
+
+
+def encode(msg):
+    return json.dumps(msg, separators=(',', ':')).encode('utf-8') + b"\n"
+
+
+class FeedPublisher(object):
+    '''Serves parsed scoreboards to any number of bots over a Unix socket.
+
+    Messages are JSON objects, one per line. A subscriber is sent a 'board'
+    message with every game of each league when it connects. After that it
+    gets a 'delta' after every poll that changed something, holding only the
+    games that changed and the IDs of games that left the board, and an
+    'error' when a league's poll failed. Subscribers that can't keep up
+    within sendTimeout seconds are dropped and have to reconnect.'''
+
+    def __init__(self, path, sendTimeout=5):
+        self.path = path
+        self.sendTimeout = sendTimeout
+        self.boards = {}
+        self.polled = {}
+        self.clients = []
+        self.published = 0
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            os.unlink(path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen(16)
+        self._closed = False
+        worker = threading.Thread(target=self._accept, name="fbbot-feed")
+        worker.daemon = True
+        worker.start()
+
+    def publish(self, league, games, polled=None):
+        '''Send what changed in league's games since the last publish.
+        Returns the number of games sent.'''
+        if polled is None:
+            polled = time.time()
+        with self._lock:
+            old = self.boards.get(league)
+            self.boards[league] = games
+            self.polled[league] = polled
+            if old is None:
+                msg = {'type': 'board', 'league': league, 'polled': polled,
+                       'games': [game.pack() for game in games.values()]}
+                sent = len(games)
+            else:
+                changed = [game.pack() for gameID, game in games.items() if old.get(gameID) != game]
+                removed = [gameID for gameID in old if gameID not in games]
+                if not changed and not removed:
+                    return 0
+                msg = {'type': 'delta', 'league': league, 'polled': polled,
+                       'changed': changed, 'removed': removed}
+                sent = len(changed)
+            self._broadcast(encode(msg))
+            self.published += 1
+        return sent
+
+    def error(self, league, error):
+        with self._lock:
+            self._broadcast(encode({'type': 'error', 'league': league, 'error': str(error)}))
+
+    def close(self):
+        self._closed = True
+        self.sock.close()
+        with self._lock:
+            for conn in self.clients:
+                conn.close()
+            self.clients = []
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                if self._closed:
+                    return
+                continue
+            conn.settimeout(self.sendTimeout)
+            with self._lock:
+                try:
+                    for league, games in self.boards.items():
+                        conn.sendall(encode({'type': 'board', 'league': league, 'polled': self.polled[league],
+                                             'games': [game.pack() for game in games.values()]}))
+                except OSError:
+                    conn.close()
+                    continue
+                self.clients.append(conn)
+            print("Feed subscriber connected (%d now)" % len(self.clients))
+
+    def _broadcast(self, data):
+        for conn in list(self.clients):
+            try:
+                conn.sendall(data)
+            except OSError:
+                conn.close()
+                self.clients.remove(conn)
+                print("Feed subscriber dropped (%d left)" % len(self.clients))
+
+
+class FeedSubscriber(object):
+    '''Follows a FeedPublisher, keeping every league's board up to date on a
+    background thread and reconnecting with backoff when the socket goes
+    away.
+
+    collect() hands back what arrived since the last call as a list of
+    (League, games, error, None), the same shape a poll of ESPN produces,
+    with no response to commit.'''
+
+    def __init__(self, path, retry=1, maxRetry=30):
+        self.path = path
+        self.retry = retry
+        self.maxRetry = maxRetry
+        self.boards = {}
+        self.pending = {}
+        self.connected = False
+        self.messages = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._sock = None
+        worker = threading.Thread(target=self._run, name="fbbot-feed")
+        worker.daemon = True
+        worker.start()
+
+    def collect(self, leagues):
+        results = []
+        with self._lock:
+            for league in leagues:
+                update = self.pending.pop(league.name, None)
+                if update is not None:
+                    results.append((league, update[0], update[1], None))
+        return results
+
+    def close(self):
+        self._closed = True
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+
+    def _run(self):
+        delay = self.retry
+        while not self._closed:
+            try:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(self.path)
+            except OSError as ex:
+                sock.close()
+                if delay == self.retry:
+                    print("Can't reach score feed at %s: %s" % (self.path, ex))
+                time.sleep(delay)
+                delay = min(delay * 2, self.maxRetry)
+                continue
+            self._sock = sock
+            self.connected = True
+            self.connections += 1
+            delay = self.retry
+            print("Subscribed to score feed at %s" % self.path)
+            try:
+                for line in sock.makefile('rb'):
+                    self._handle(json.loads(line.decode('utf-8')))
+            except (OSError, ValueError) as ex:
+                print("Score feed connection lost: %s" % ex)
+            finally:
+                self.connected = False
+                sock.close()
+            time.sleep(delay)
+
+    def _handle(self, msg):
+        league = msg['league']
+        with self._lock:
+            self.messages += 1
+            if msg['type'] == 'error':
+                self.pending[league] = (None, RuntimeError(msg['error']))
+                return
+            if msg['type'] == 'board':
+                games = dict((packed[0], Game.unpack(packed)) for packed in msg['games'])
+            else:
+                # Copy, so the board the plugin is holding isn't changed under it
+                games = dict(self.boards.get(league, {}))
+                for packed in msg['changed']:
+                    games[packed[0]] = Game.unpack(packed)
+                for gameID in msg['removed']:
+                    games.pop(gameID, None)
+            self.boards[league] = games
+            self.pending[league] = (games, None)
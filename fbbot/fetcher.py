@@ -0,0 +1,67 @@
+import threading
+import time
+
+
+class BackgroundFetch(object):
+    '''Runs a fetch function on a worker thread so the caller never blocks on it.
+
+    The caller starts a fetch with start() and later picks up the finished
+    result with collect(). A fetch that runs past its timeout is abandoned:
+    its result is thrown away when it eventually arrives and a new fetch may
+    be started in its place.'''
+
+    def __init__(self, func, timeout):
+        self.func = func
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._started = None
+        self._result = None
+
+    def running(self):
+        '''True if a fetch is in flight and has not yet timed out.'''
+        with self._lock:
+            return self._started is not None and \
+                time.time() - self._started < self.timeout
+
+    def start(self, *args, **kwargs):
+        '''Start a fetch unless one is already in flight. Returns True if a
+        new fetch was started.'''
+        with self._lock:
+            if self._started is not None and time.time() - self._started < self.timeout:
+                return False
+            if self._started is not None:
+                # Previous fetch timed out; report it and drop its result
+                self._result = (None, TimeoutError("fetch took longer than %d seconds" % self.timeout),
+                                time.time() - self._started)
+            self._generation += 1
+            self._started = time.time()
+            generation = self._generation
+
+        worker = threading.Thread(target=self._run, args=(generation, args, kwargs),
+                                  name="fbbot-fetch")
+        worker.daemon = True
+        worker.start()
+        return True
+
+    def collect(self):
+        '''Return (data, error, duration) for the last finished fetch, or None if
+        nothing new has finished since the last call.'''
+        with self._lock:
+            result = self._result
+            self._result = None
+            return result
+
+    def _run(self, generation, args, kwargs):
+        started = time.time()
+        data, error = None, None
+        try:
+            data = self.func(*args, **kwargs)
+        except Exception as ex:
+            error = ex
+        with self._lock:
+            if generation != self._generation or self._started is None:
+                # Abandoned after a timeout
+                return
+            self._result = (data, error, time.time() - started)
+            self._started = None
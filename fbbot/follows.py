@@ -0,0 +1,139 @@
+from fbbot.teamindex import normalize
+
+
+class FollowStore(object):
+    '''Which users follow which teams, persisted to a pyaib db bucket.
+
+    Each user is one db item (lower-cased nick -> {'nick', 'teams'}), with
+    teams a list of [team name, ESPN team ID or None]. Two indexes map team
+    names and ESPN team IDs straight to the set of nicks following them, so
+    finding who to tell about a game is four dict lookups no matter how many
+    users there are. Teams followed while off the board are kept in a third
+    index until learn() finds their ESPN IDs.'''
+
+    def __init__(self, bucket, limit=10):
+        self.bucket = bucket
+        self.limit = limit
+        self.users = {}
+        self.byName = {}
+        self.byID = {}
+        self.unresolved = {}
+        for item in bucket.getAll():
+            self.users[item.key] = item.value
+            for name, teamID in item.value['teams']:
+                self._index(item.value['nick'], name, teamID)
+
+    def teams(self, nick):
+        user = self.users.get(nick.lower())
+        return [name for name, _ in user['teams']] if user else []
+
+    def follows(self, nick, name, teamID=None):
+        '''True if nick follows the team, by name or by ESPN team ID.'''
+        user = self.users.get(nick.lower())
+        if user is None:
+            return False
+        return self._find(user, normalize(name), teamID) is not None
+
+    def follow(self, nick, name, teamID=None):
+        '''Follow a team. Returns False if nick already follows it or is at
+        the limit.'''
+        name = normalize(name)
+        user = self.users.get(nick.lower())
+        if user is None:
+            user = {'nick': nick, 'teams': []}
+        entry = self._find(user, name, teamID)
+        if entry is not None:
+            if teamID is not None and entry[1] is None:
+                # Learned the team's ESPN ID since they followed it
+                self._resolve(user, entry, teamID)
+                self._save(nick, user)
+            return False
+        if len(user['teams']) >= self.limit:
+            return False
+        user['teams'].append([name, teamID])
+        self._index(user['nick'], name, teamID)
+        self._save(nick, user)
+        return True
+
+    def unfollow(self, nick, name=None, teamID=None):
+        '''Stop following a team (matched by name or ESPN team ID), or every
+        team if name is None. Returns the number of teams dropped.'''
+        user = self.users.get(nick.lower())
+        if user is None:
+            return 0
+        name = normalize(name) if name is not None else None
+        keep = []
+        dropped = 0
+        for entry in user['teams']:
+            if name is None or entry[0] == name or (teamID is not None and entry[1] == teamID):
+                self._unindex(user['nick'], entry[0], entry[1])
+                dropped += 1
+            else:
+                keep.append(entry)
+        user['teams'] = keep
+        self._save(nick, user)
+        return dropped
+
+    def learn(self, teams):
+        '''Fill in the ESPN team IDs of followed teams that are now on the
+        board. teams is the TeamIndex, rebuilt for the current games.'''
+        for name in list(self.unresolved):
+            found = teams.team(name)
+            if found is None or found[1] is None:
+                continue
+            for key in list(self.unresolved.get(name, ())):
+                user = self.users[key]
+                for entry in user['teams']:
+                    if entry[0] == name and entry[1] is None:
+                        self._resolve(user, entry, found[1])
+                self.bucket.set(key, user)
+
+    def followers(self, game):
+        '''Return the nicks following either team in game.'''
+        found = set()
+        for index, key in ((self.byID, game.homeid), (self.byID, game.awayid),
+                           (self.byName, normalize(game.hometeam)),
+                           (self.byName, normalize(game.awayteam))):
+            nicks = index.get(key)
+            if nicks:
+                found.update(nicks)
+        return found
+
+    def __len__(self):
+        return len(self.users)
+
+    def _find(self, user, name, teamID):
+        for entry in user['teams']:
+            if entry[0] == name or (teamID is not None and entry[1] == teamID):
+                return entry
+        return None
+
+    def _resolve(self, user, entry, teamID):
+        self._unindex(user['nick'], entry[0], None)
+        entry[1] = teamID
+        self._index(user['nick'], entry[0], teamID)
+
+    def _index(self, nick, name, teamID):
+        self.byName.setdefault(name, set()).add(nick)
+        if teamID is not None:
+            self.byID.setdefault(teamID, set()).add(nick)
+        else:
+            self.unresolved.setdefault(name, set()).add(nick.lower())
+
+    def _unindex(self, nick, name, teamID):
+        for index, key, member in ((self.byName, name, nick), (self.byID, teamID, nick),
+                                   (self.unresolved, name if teamID is None else None, nick.lower())):
+            members = index.get(key)
+            if members is not None:
+                members.discard(member)
+                if not members:
+                    del index[key]
+
+    def _save(self, nick, user):
+        key = nick.lower()
+        if user['teams']:
+            self.users[key] = user
+            self.bucket.set(key, user)
+        elif key in self.users:
+            del self.users[key]
+            self.bucket.delete(key)
@@ -0,0 +1,113 @@
+import heapq
+
+# Longer queries are cut down to this, which bounds the cost of a search
+MAX_QUERY = 24
+# Candidates that get the exact edit-distance check
+CANDIDATES = 3
+
+
+def trigrams(text):
+    '''The set of 3-character windows of text, padded so the start and end
+    of a word count for more.'''
+    padded = "  " + text + " "
+    return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def editDistance(a, b, limit):
+    '''Levenshtein distance, with a swap of two neighbouring characters
+    counted as one edit (the usual "aubrun" typo). Only distances up to limit
+    matter, so only a band of the table that wide is filled in, and anything
+    further apart comes back as limit + 1.'''
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    prev2 = None
+    prev = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        cur = [over] * (len(b) + 1)
+        if i <= limit:
+            cur[0] = i
+        low = max(1, i - limit)
+        high = min(len(b), i + limit)
+        for j in range(low, high + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, prev2[j - 2] + 1)
+            cur[j] = min(value, over)
+        if min(cur[low - 1:high + 1]) > limit:
+            return over
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def allowedEdits(text):
+    '''How many typos a query of this length may have: none for short
+    abbreviations, then one per four characters, at most three.'''
+    return min(3, len(text) // 4)
+
+
+class TrigramIndex(object):
+    '''Finds the closest known name to a misspelled one.
+
+    Every name is split into trigrams and each trigram maps to the names
+    containing it. A search counts shared trigrams over the query's posting
+    lists only, ranks names by the Dice coefficient of the two trigram sets,
+    and confirms the best few with an edit distance. Queries are cut to
+    MAX_QUERY characters, so a search costs at most that many posting list
+    walks plus CANDIDATES small edit-distance tables.'''
+
+    def __init__(self, names=()):
+        self.names = []
+        self.sizes = []
+        self.known = {}
+        self.postings = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        '''Index name, unless it already is. Return True if it was new.'''
+        if name in self.known:
+            return False
+        grams = trigrams(name)
+        nameID = self.known[name] = len(self.names)
+        self.names.append(name)
+        self.sizes.append(len(grams))
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(nameID)
+        return True
+
+    def search(self, query, limit=CANDIDATES):
+        '''Return up to limit (score, name) pairs sharing trigrams with query,
+        best first. score is the Dice coefficient, from 0 to 1.'''
+        query = query[:MAX_QUERY]
+        grams = trigrams(query)
+        shared = {}
+        for gram in grams:
+            for nameID in self.postings.get(gram, ()):
+                shared[nameID] = shared.get(nameID, 0) + 1
+        total = len(grams)
+        sizes = self.sizes
+        best = heapq.nlargest(limit, shared.items(),
+                              key=lambda item: item[1] * 2.0 / (total + sizes[item[0]]))
+        return [(count * 2.0 / (total + sizes[nameID]), self.names[nameID]) for nameID, count in best]
+
+    def best(self, query):
+        '''Return the known name query is most likely a typo of, or None if
+        nothing is within allowedEdits(query) edits. The fewest edits wins.'''
+        query = query[:MAX_QUERY]
+        if query in self.known:
+            return query
+        edits = allowedEdits(query)
+        if edits == 0:
+            return None
+        found = None
+        for score, name in self.search(query):
+            distance = editDistance(query, name[:MAX_QUERY], edits)
+            # Ties go to the longer name, so full names beat abbreviations
+            if distance <= edits and (found is None or (distance, -len(name)) < found):
+                found = (distance, -len(name), name)
+        return found[2] if found is not None else None
+
+    def __len__(self):
+        return len(self.names)
@@ -0,0 +1,104 @@
+import sys
+
+# Game status codes, as parsed from ESPN's status.type.state
+GAME_STATUS_PRE = 0
+GAME_STATUS_IN = 1
+GAME_STATUS_POST = 2
+
+GAME_STATUSES = {"pre": GAME_STATUS_PRE, "in": GAME_STATUS_IN, "post": GAME_STATUS_POST}
+
+
+def _intern(value):
+    '''sys.intern that lets None through.'''
+    return None if value is None else sys.intern(value)
+
+
+class Game(object):
+    '''One game on the scoreboard.
+
+    Team names, abbreviations and other strings that repeat on every poll
+    are interned, so the old and new boards share them. The optional fields
+    (network, down, possess, lastplay, odds, and the teams' poll ranks and
+    ESPN conference IDs) are None when ESPN leaves them out. version is set
+    by GameDiff and isn't part of a game's identity.
+
+    Games compare equal when every field but version matches. The fields
+    that change during a game are cheap to pull out with fingerprint().'''
+
+    __slots__ = ('id', 'league', 'date', 'status', 'time', 'location',
+                 'hometeam', 'homeid', 'homeabv', 'homescore',
+                 'awayteam', 'awayid', 'awayabv', 'awayscore',
+                 'network', 'down', 'possess', 'lastplay', 'odds',
+                 'homerank', 'awayrank', 'homeconf', 'awayconf', 'version')
+
+    def __init__(self, id, league, date, status, time, location,
+                 hometeam, homeid, homeabv, homescore, awayteam, awayid, awayabv, awayscore,
+                 network=None, down=None, possess=None, lastplay=None, odds=None,
+                 homerank=None, awayrank=None, homeconf=None, awayconf=None):
+        self.id = _intern(id)
+        self.league = _intern(league)
+        self.date = _intern(date)
+        self.status = status
+        self.time = time
+        self.location = _intern(location)
+        self.hometeam = _intern(hometeam)
+        self.homeid = _intern(homeid)
+        self.homeabv = _intern(homeabv)
+        self.homescore = homescore
+        self.awayteam = _intern(awayteam)
+        self.awayid = _intern(awayid)
+        self.awayabv = _intern(awayabv)
+        self.awayscore = awayscore
+        self.network = _intern(network)
+        self.down = down
+        self.possess = possess
+        self.lastplay = lastplay
+        self.odds = odds
+        self.homerank = homerank
+        self.awayrank = awayrank
+        self.homeconf = _intern(homeconf)
+        self.awayconf = _intern(awayconf)
+        self.version = None
+
+    def fingerprint(self):
+        '''Return a hashable summary of the parts of the game that change.
+        Anything not in here (date, location, team names...) stays put for
+        the whole game.'''
+        return (self.status, self.homescore, self.awayscore, self.time, self.possess,
+                self.down, self.lastplay, self.odds, self.network)
+
+    def pack(self):
+        '''Return the game as a flat list for storage; see unpack().'''
+        return [self.id, self.league, self.date, self.status, self.time, self.location,
+                self.hometeam, self.homeid, self.homeabv, self.homescore,
+                self.awayteam, self.awayid, self.awayabv, self.awayscore,
+                self.network, self.down, self.possess, self.lastplay, self.odds,
+                self.homerank, self.awayrank, self.homeconf, self.awayconf]
+
+    @classmethod
+    def unpack(cls, packed):
+        return cls(*packed)
+
+    def ranked(self):
+        '''True if either team is in the top 25.'''
+        return self.homerank is not None or self.awayrank is not None
+
+    def _static(self):
+        return (self.id, self.league, self.date, self.location, self.hometeam, self.homeid,
+                self.homeabv, self.awayteam, self.awayid, self.awayabv,
+                self.homerank, self.awayrank, self.homeconf, self.awayconf)
+
+    def __eq__(self, other):
+        if not isinstance(other, Game):
+            return NotImplemented
+        return self.fingerprint() == other.fingerprint() and self._static() == other._static()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash((self.id, self.fingerprint()))
+
+    def __repr__(self):
+        return "Game(%s, %s @ %s)" % (self.id, self.awayabv, self.homeabv)
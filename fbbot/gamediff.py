@@ -0,0 +1,109 @@
+from fbbot.game import GAME_STATUS_IN
+
+# Change event types
+EVENT_STATUS = "status"
+EVENT_SCORE = "score"
+EVENT_HALFTIME_START = "halftime_start"
+EVENT_HALFTIME_END = "halftime_end"
+EVENT_POSSESSION = "possession"
+EVENT_ODDS = "odds"
+
+
+class GameEvent(object):
+    '''A single change to a game between two polls.
+
+    old is None for the first poll a game is seen in. For EVENT_SCORE,
+    chgHome/chgAway hold the points each side just scored.'''
+
+    __slots__ = ('kind', 'gameID', 'game', 'old', 'chgHome', 'chgAway')
+
+    def __init__(self, kind, game, old, chgHome=0, chgAway=0):
+        self.kind = kind
+        self.gameID = game.id
+        self.game = game
+        self.old = old
+        self.chgHome = chgHome
+        self.chgAway = chgAway
+
+    def __repr__(self):
+        return "GameEvent(%s, %s)" % (self.kind, self.gameID)
+
+
+class GameDiff(object):
+    '''Turns consecutive polls into a list of GameEvents.
+
+    A fingerprint is kept per game ID, so games that didn't change since the
+    last poll are skipped after a single tuple comparison and the per-poll
+    work scales with the number of games that actually changed.
+
+    Every game also gets a version number that only changes when its
+    fingerprint does, so anything derived from a game can be cached on
+    (game ID, version).'''
+
+    def __init__(self):
+        self.fingerprints = {}
+        self.versions = {}
+        self.nextVersion = 1
+
+    def reset(self):
+        self.fingerprints = {}
+        self.versions = {}
+
+    def prime(self, games):
+        '''Take games (e.g. restored from a snapshot) as the last poll without
+        producing any events for them.'''
+        self.fingerprints = {}
+        self.versions = {}
+        for gameID, game in games.items():
+            self.fingerprints[gameID] = game.fingerprint()
+            game.version = self.versions[gameID] = self.nextVersion
+            self.nextVersion += 1
+
+    def diff(self, oldGames, newGames):
+        '''Return the events that turn oldGames into newGames. Both are dicts
+        of game ID -> Game.'''
+        events = []
+        fingerprints = {}
+        versions = {}
+        for gameID, game in newGames.items():
+            fp = game.fingerprint()
+            fingerprints[gameID] = fp
+            if self.fingerprints.get(gameID) == fp and gameID in oldGames:
+                game.version = versions[gameID] = self.versions[gameID]
+                continue
+            game.version = versions[gameID] = self.nextVersion
+            self.nextVersion += 1
+            events.extend(self.gameEvents(game, oldGames.get(gameID)))
+        self.fingerprints = fingerprints
+        self.versions = versions
+        return events
+
+    def gameEvents(self, game, old):
+        '''Return the events for one changed game, in announcement order.'''
+        events = []
+        if game.odds is not None and (old is None or old.odds != game.odds):
+            events.append(GameEvent(EVENT_ODDS, game, old))
+        if old is None:
+            # First time we've seen this game; nothing to compare against
+            return events
+
+        if game.status != old.status:
+            # A status transition is the only event announced for this poll
+            events.append(GameEvent(EVENT_STATUS, game, old))
+            return events
+
+        if game.time != old.time:
+            if game.time == "Halftime":
+                events.append(GameEvent(EVENT_HALFTIME_START, game, old))
+            if old.time == "Halftime":
+                events.append(GameEvent(EVENT_HALFTIME_END, game, old))
+
+        if game.status == GAME_STATUS_IN:
+            chgHome = game.homescore - old.homescore
+            chgAway = game.awayscore - old.awayscore
+            if chgHome > 0 or chgAway > 0:
+                events.append(GameEvent(EVENT_SCORE, game, old, chgHome, chgAway))
+
+        if game.possess != old.possess:
+            events.append(GameEvent(EVENT_POSSESSION, game, old))
+        return events
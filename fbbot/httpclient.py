@@ -0,0 +1,171 @@
+import hashlib
+import http.client
+import socket
+import threading
+import zlib
+from urllib.parse import urlsplit, urljoin
+
+MAX_REDIRECTS = 5
+MAX_IDLE_PER_HOST = 4
+
+
+class HttpResponse(object):
+    '''The result of HttpClient.get().
+
+    notModified is True when the server answered 304 or sent back exactly the
+    same body as the last committed response for this URL; in that case body
+    is None and there is nothing new to parse. validators is what
+    HttpClient.commit() remembers for the URL.'''
+
+    def __init__(self, url, status, headers, body, notModified, wireBytes, validators=None):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.notModified = notModified
+        self.wireBytes = wireBytes
+        self.validators = validators
+
+
+class HttpClient(object):
+    '''A small HTTP/1.1 client for polling the same few URLs over and over.
+
+    Connections are kept alive and reused per host, responses are requested
+    and decoded with gzip/deflate, and the ETag/Last-Modified validators of
+    each URL are remembered so repeat polls are sent as conditional requests.
+    Validators are only remembered once the caller commit()s a response, so
+    a body that was thrown away or failed to parse is fetched in full again.
+    Safe to share between fetch threads.'''
+
+    def __init__(self, userAgent=None, timeout=15):
+        self.userAgent = userAgent
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._validators = {}
+
+    def get(self, url, headers=None):
+        '''GET url, following redirects. Raises http.client.HTTPException or
+        OSError on failure and ValueError on a non-2xx/304 status.'''
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._get(url, headers)
+            if response.status in (301, 302, 303, 307, 308):
+                url = urljoin(url, response.headers.get('Location', ''))
+                continue
+            if response.status != 304 and not 200 <= response.status < 300:
+                raise ValueError("HTTP %d from %s" % (response.status, url))
+            return response
+        raise ValueError("Too many redirects fetching %s" % url)
+
+    def commit(self, response):
+        '''Remember response's validators, once its body has been used.'''
+        if response.validators is None:
+            return
+        with self._lock:
+            self._validators[response.url] = response.validators
+
+    def close(self):
+        '''Close all idle connections.'''
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def _get(self, url, headers):
+        parts = urlsplit(url)
+        hostKey = (parts.scheme, parts.netloc)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        reqHeaders = {'Accept-Encoding': 'gzip, deflate',
+                      'Connection': 'keep-alive',
+                      'Cache-Control': 'max-age=0'}
+        if self.userAgent:
+            reqHeaders['User-Agent'] = self.userAgent
+        with self._lock:
+            validators = self._validators.get(url)
+        if validators is not None:
+            if validators['etag']:
+                reqHeaders['If-None-Match'] = validators['etag']
+            if validators['modified']:
+                reqHeaders['If-Modified-Since'] = validators['modified']
+        if headers:
+            reqHeaders.update(headers)
+
+        conn, reused = self._checkout(hostKey)
+        try:
+            try:
+                conn.request('GET', path, headers=reqHeaders)
+                resp = conn.getresponse()
+            except socket.timeout:
+                # A slow server won't be any faster on a new connection
+                raise
+            except (http.client.HTTPException, OSError):
+                if not reused:
+                    raise
+                # Stale keep-alive connection; retry once on a fresh one
+                conn.close()
+                conn = self._connect(hostKey)
+                conn.request('GET', path, headers=reqHeaders)
+                resp = conn.getresponse()
+            raw = resp.read()
+        except Exception:
+            conn.close()
+            raise
+
+        if resp.will_close:
+            conn.close()
+        else:
+            self._checkin(hostKey, conn)
+
+        respHeaders = dict((k.title(), v) for k, v in resp.getheaders())
+        if resp.status == 304:
+            return HttpResponse(url, 304, respHeaders, None, True, len(raw))
+        if not 200 <= resp.status < 300:
+            return HttpResponse(url, resp.status, respHeaders, None, False, len(raw))
+
+        body = self._decode(raw, respHeaders.get('Content-Encoding', ''))
+        digest = hashlib.sha1(body).digest()
+        unchanged = validators is not None and validators['digest'] == digest
+        fresh = {'etag': respHeaders.get('Etag'),
+                 'modified': respHeaders.get('Last-Modified'),
+                 'digest': digest}
+        if unchanged:
+            return HttpResponse(url, resp.status, respHeaders, None, True, len(raw), fresh)
+        return HttpResponse(url, resp.status, respHeaders, body, False, len(raw), fresh)
+
+    def _decode(self, raw, encoding):
+        encoding = encoding.lower().strip()
+        if encoding == 'gzip' or encoding == 'x-gzip':
+            return zlib.decompress(raw, 16 + zlib.MAX_WBITS)
+        if encoding == 'deflate':
+            try:
+                return zlib.decompress(raw)
+            except zlib.error:
+                # Some servers send raw deflate without the zlib header
+                return zlib.decompress(raw, -zlib.MAX_WBITS)
+        return raw
+
+    def _connect(self, hostKey):
+        scheme, netloc = hostKey
+        if scheme == 'https':
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def _checkout(self, hostKey):
+        '''Return (connection, True if it came from the idle pool).'''
+        with self._lock:
+            conns = self._idle.get(hostKey)
+            if conns:
+                return conns.pop(), True
+        return self._connect(hostKey), False
+
+    def _checkin(self, hostKey, conn):
+        with self._lock:
+            conns = self._idle.setdefault(hostKey, [])
+            if len(conns) < MAX_IDLE_PER_HOST:
+                conns.append(conn)
+                return
+        conn.close()
@@ -0,0 +1,30 @@
+from fbbot.gamediff import GameDiff
+
+# ESPN scoreboard group IDs
+LEAGUE_GROUPS = {
+    "fbs": "80",
+    "fcs": "81",
+}
+
+
+class League(object):
+    '''Per-league polling state: the last applied games and their diff state.'''
+
+    def __init__(self, name):
+        if name not in LEAGUE_GROUPS:
+            raise ValueError("Unknown league %r (known: %s)" % (name, ', '.join(sorted(LEAGUE_GROUPS))))
+        self.name = name
+        self.group = LEAGUE_GROUPS[name]
+        self.games = {}
+        self.differ = GameDiff()
+
+    def apply(self, newGames):
+        '''Swap in newGames and return the change events since the last apply.'''
+        events = self.differ.diff(self.games, newGames)
+        self.games = newGames
+        return events
+
+    def restore(self, games):
+        '''Start from previously saved games instead of an empty board.'''
+        self.differ.prime(games)
+        self.games = games
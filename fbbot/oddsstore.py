@@ -0,0 +1,88 @@
+import os
+import time
+
+import fbbot.thirdparty.pickledb
+
+DAY = 86400
+
+
+class OddsStore(object):
+    '''Cache of betting lines per game ID, persisted to a pyaib db bucket.
+
+    ESPN drops the line from a game once it kicks off, so the last line seen
+    is kept here for !line. Changes are tracked in memory and only the dirty
+    games are written, at most once every flushFreq seconds. Lines for games
+    that finished more than expireDays ago are dropped, as are entries that
+    haven't been touched in staleDays (postponed or cancelled games).'''
+
+    def __init__(self, bucket, flushFreq=300, expireDays=7, staleDays=60):
+        self.bucket = bucket
+        self.flushFreq = flushFreq
+        self.expireAge = expireDays * DAY
+        self.staleAge = staleDays * DAY
+        self.entries = {}
+        self.dirty = set()
+        self.lastFlush = 0
+        for item in bucket.getAll():
+            self.entries[item.key] = item.value
+
+    def importPickle(self, path):
+        '''One-time import of the old oddsCache.db pickledb file, if the bucket
+        is still empty. Returns the number of lines imported.'''
+        if self.entries or not os.path.exists(path):
+            return 0
+        old = fbbot.thirdparty.pickledb.load(path, False)
+        now = time.time()
+        for gameID in old.getall():
+            self.entries[gameID] = {'odds': old.get(gameID), 'updated': now, 'finished': None}
+            self.dirty.add(gameID)
+        return len(self.dirty)
+
+    def get(self, gameID):
+        entry = self.entries.get(gameID)
+        if entry is None:
+            return None
+        return entry['odds']
+
+    def set(self, gameID, odds):
+        '''Record odds for a game. Returns True if they differ from the cache.'''
+        entry = self.entries.get(gameID)
+        if entry is not None and entry['odds'] == odds:
+            return False
+        self.entries[gameID] = {'odds': odds, 'updated': time.time(),
+                                'finished': entry['finished'] if entry else None}
+        self.dirty.add(gameID)
+        return True
+
+    def finished(self, gameID):
+        '''Mark a game as over so its line can expire.'''
+        entry = self.entries.get(gameID)
+        if entry is not None and entry['finished'] is None:
+            entry['finished'] = time.time()
+            self.dirty.add(gameID)
+
+    def flush(self, force=False):
+        '''Expire old entries and write dirty ones if flushFreq has passed.
+        Returns the number of entries written or deleted.'''
+        now = time.time()
+        if not force and now - self.lastFlush < self.flushFreq:
+            return 0
+        self.lastFlush = now
+        self.expire(now)
+        written = 0
+        for gameID in self.dirty:
+            entry = self.entries.get(gameID)
+            if entry is None:
+                self.bucket.delete(gameID)
+            else:
+                self.bucket.set(gameID, entry)
+            written += 1
+        self.dirty = set()
+        return written
+
+    def expire(self, now):
+        for gameID, entry in list(self.entries.items()):
+            if (entry['finished'] is not None and now - entry['finished'] > self.expireAge) or \
+                    now - entry['updated'] > self.staleAge:
+                del self.entries[gameID]
+                self.dirty.add(gameID)
@@ -0,0 +1,155 @@
+import heapq
+import itertools
+import time
+
+# Message priorities, most urgent first
+PRIORITY_SCORE = 0
+PRIORITY_UPDATE = 1
+PRIORITY_DEBUG = 2
+
+
+class TokenBucket(object):
+    '''Allows burst messages at once, refilling at rate messages per second.'''
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.time()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def ready(self, now):
+        self.refill(now)
+        return self.tokens >= 1
+
+    def take(self):
+        self.tokens -= 1
+
+
+class Outgoing(object):
+    __slots__ = ('target', 'msg', 'priority', 'key', 'batchable', 'seq', 'queued', 'since', 'dead')
+
+    def __init__(self, target, msg, priority, key, batchable, seq, queued, since):
+        self.target = target
+        self.msg = msg
+        self.priority = priority
+        self.key = key
+        self.batchable = batchable
+        self.seq = seq
+        self.queued = queued
+        self.since = since
+        self.dead = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class OutboundQueue(object):
+    '''Paces outgoing PRIVMSGs so bursts of announcements don't trip the
+    server's flood limits.
+
+    Every target has its own token bucket, and a connection-wide bucket sits
+    on top. Messages go out most urgent first, oldest first within a priority.
+    A message queued with a key replaces any message with the same target and
+    key that is still waiting, so only the newest update for a game is sent.
+    With batch on, waiting batchable messages for the same target are joined
+    into one line.
+
+    If observe is given, it is called with the end-to-end latency of every
+    message that was queued with a since time (e.g. when the change it
+    announces was fetched).'''
+
+    def __init__(self, rate=0.5, burst=3, globalRate=1.0, globalBurst=5,
+                 batch=False, maxLine=400, separator=" || ", observe=None):
+        self.rate = rate
+        self.observe = observe
+        self.burst = burst
+        self.batch = batch
+        self.maxLine = maxLine
+        self.separator = separator
+        self.connection = TokenBucket(globalRate, globalBurst)
+        self.buckets = {}
+        self.heap = []
+        self.pending = {}
+        self.counter = itertools.count()
+        self.queued = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.batched = 0
+        self.latency = 0.0
+
+    def __len__(self):
+        return sum(1 for entry in self.heap if not entry.dead)
+
+    def put(self, target, msg, priority=PRIORITY_UPDATE, key=None, batchable=False, since=None):
+        '''Queue msg for target. Messages with the same target and key replace
+        each other while waiting.'''
+        now = time.time()
+        queued = now
+        if key is not None:
+            old = self.pending.get((target, key))
+            if old is not None:
+                old.dead = True
+                priority = min(priority, old.priority)
+                queued = old.queued
+                if old.since is not None and (since is None or old.since < since):
+                    since = old.since
+                self.coalesced += 1
+        entry = Outgoing(target, msg, priority, key, batchable, next(self.counter), queued, since)
+        if key is not None:
+            self.pending[(target, key)] = entry
+        heapq.heappush(self.heap, entry)
+        self.queued += 1
+
+    def drain(self, send, now=None):
+        '''Send as many waiting messages as the buckets allow, calling
+        send(target, msg) for each. Returns the number of lines sent.'''
+        if now is None:
+            now = time.time()
+        lines = 0
+        blocked = []
+        while self.heap and self.connection.ready(now):
+            entry = heapq.heappop(self.heap)
+            if entry.dead:
+                continue
+            bucket = self.buckets.get(entry.target)
+            if bucket is None:
+                bucket = self.buckets[entry.target] = TokenBucket(self.rate, self.burst)
+            if not bucket.ready(now):
+                blocked.append(entry)
+                continue
+            msg = entry.msg
+            self._done(entry, now)
+            if self.batch and entry.batchable:
+                msg = self._batch(entry, msg, now)
+            bucket.take()
+            self.connection.take()
+            send(entry.target, msg)
+            lines += 1
+        for entry in blocked:
+            heapq.heappush(self.heap, entry)
+        return lines
+
+    def _done(self, entry, now):
+        if entry.key is not None and self.pending.get((entry.target, entry.key)) is entry:
+            del self.pending[(entry.target, entry.key)]
+        self.sent += 1
+        self.latency = now - entry.queued
+        if self.observe is not None and entry.since is not None:
+            self.observe(now - entry.since)
+
+    def _batch(self, first, msg, now):
+        '''Append other waiting batchable messages for first's target to msg.'''
+        for entry in sorted(self.heap):
+            if entry.dead or not entry.batchable or entry.target != first.target:
+                continue
+            if len(msg) + len(self.separator) + len(entry.msg) > self.maxLine:
+                break
+            msg += self.separator + entry.msg
+            entry.dead = True
+            self._done(entry, now)
+            self.batched += 1
+        return msg
@@ -0,0 +1,49 @@
+import gzip
+import os
+import re
+import time
+
+RECORDING_NAME = re.compile(r'^(\d+)\.(\d{3})\.html\.gz$')
+
+
+class PayloadRecorder(object):
+    '''Saves raw scoreboard payloads as they are fetched, for offline replay.
+
+    Each payload is written gzip-compressed to <directory>/<league>/ with its
+    fetch time as the file name (seconds.milliseconds.html.gz).'''
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def record(self, league, body, when=None):
+        if when is None:
+            when = time.time()
+        leagueDir = os.path.join(self.directory, league)
+        os.makedirs(leagueDir, exist_ok=True)
+        path = os.path.join(leagueDir, "%d.%03d.html.gz" % (int(when), int(when * 1000) % 1000))
+        with gzip.open(path + ".tmp", 'wb') as f:
+            f.write(body)
+        os.replace(path + ".tmp", path)
+        return path
+
+
+def loadRecordings(directory):
+    '''Return every recorded payload under directory as a time-ordered list
+    of (timestamp, league, path).'''
+    recordings = []
+    for league in sorted(os.listdir(directory)):
+        leagueDir = os.path.join(directory, league)
+        if not os.path.isdir(leagueDir):
+            continue
+        for name in os.listdir(leagueDir):
+            match = RECORDING_NAME.match(name)
+            if match:
+                when = int(match.group(1)) + int(match.group(2)) / 1000.0
+                recordings.append((when, league, os.path.join(leagueDir, name)))
+    recordings.sort()
+    return recordings
+
+
+def readRecording(path):
+    with gzip.open(path, 'rb') as f:
+        return f.read()
@@ -0,0 +1,155 @@
+import time
+
+from fbbot.game import GAME_STATUS_PRE, GAME_STATUS_IN, GAME_STATUS_POST
+from fbbot.thirdparty.ircformat import bold, underline
+
+HALFTIME_LENGTH = 1200
+
+SCORING_DESCS = {
+    1: "Extra Point GOOD",
+    2: "+2 Points",
+    3: "Field Goal GOOD!",
+    6: "TOUCHDOWN!",
+    7: "TOUCHDOWN! (+XP GOOD)",
+    8: "TOUCHDOWN! (+2 PT GOOD)",
+}
+
+
+def convertDateToEastern(date):
+    # dateutil is slow to import and only needed once a pregame game is shown
+    from dateutil import tz, parser as dateparser
+    to_zone = tz.gettz('America/New_York')
+    utc = dateparser.parse(date)
+    eastern = utc.astimezone(to_zone)
+    return eastern.strftime('%A, %B %d, %I:%M %p %Z')
+
+
+def getScoringDesc(change):
+    return SCORING_DESCS.get(change)
+
+
+class GameRenderer(object):
+    '''Builds the short and long text descriptions of games.
+
+    The parts of a description that depend only on the game are rendered
+    once per game version (see GameDiff) and cached per game ID. Per-call
+    pieces - the scoring description of an announcement and the halftime
+    countdown - are added on top of the cached fragments.'''
+
+    def __init__(self, halftimes, halftimeLength=HALFTIME_LENGTH):
+        # game ID -> time halftime started, shared with the plugin
+        self.halftimes = halftimes
+        self.halftimeLength = halftimeLength
+        self.cache = {}
+        self.kickoffs = {}
+
+    def kickoffText(self, date):
+        '''Eastern-time kickoff text for an ESPN date; parsed once per date.'''
+        text = self.kickoffs.get(date)
+        if text is None:
+            text = self.kickoffs[date] = convertDateToEastern(date)
+        return text
+
+    def prune(self, games):
+        '''Drop cached fragments for games that are no longer on the board.'''
+        for gameID in list(self.cache):
+            if gameID not in games:
+                del self.cache[gameID]
+
+    def fragments(self, game):
+        version = game.version
+        if version is not None:
+            cached = self.cache.get(game.id)
+            if cached is not None and cached['version'] == version:
+                return cached
+        frags = self.render(game)
+        frags['version'] = version
+        if version is not None:
+            self.cache[game.id] = frags
+        return frags
+
+    def render(self, game):
+        frags = {}
+        status = game.status
+        if status == GAME_STATUS_PRE:
+            frags['short'] = "%s @ %s - %s" % (game.awayabv, game.homeabv, game.time)
+        else:
+            frags['short'] = "%s %d @ %s %d - %s" % (game.awayabv, game.awayscore,
+                                                     game.homeabv, game.homescore,
+                                                     game.time)
+        if status != GAME_STATUS_POST and game.network is not None:
+            frags['short'] += " (%s)" % game.network
+
+        tv = ""
+        if game.network is not None:
+            tv = " [TV: %s]" % game.network
+
+        if status == GAME_STATUS_PRE:
+            frags['long'] = "%s @ %s - %s - %s%s" % (bold(game.awayteam), bold(game.hometeam),
+                                                     self.kickoffText(game.date),
+                                                     game.location, tv)
+        elif status == GAME_STATUS_POST:
+            frags['long'] = "%s %d @ %s %d - %s" % (bold(game.awayteam), game.awayscore,
+                                                    bold(game.hometeam), game.homescore,
+                                                    game.time)
+        elif status == GAME_STATUS_IN:
+            possess = game.possess
+            head = "%s %d" % (bold(game.awayteam), game.awayscore)
+            if possess == "away":
+                head += " <-"
+            head += " @"
+            if possess == "home":
+                head += " ->"
+            head += " %s %d" % (bold(game.hometeam), game.homescore)
+            head += " - %s" % game.time
+            frags['head'] = head
+
+            down = ""
+            if game.down is not None:
+                down = " | %s" % game.down
+            frags['situationEndHalf'] = down
+            if game.lastplay is not None:
+                down += " (Last play: %s)" % game.lastplay
+            frags['situation'] = down
+            frags['halftime'] = "Halftime" in game.time
+            frags['tv'] = tv
+        else:
+            frags['long'] = ""
+        return frags
+
+    def short(self, game):
+        return self.fragments(game)['short']
+
+    def long(self, game, chgHome=0, chgAway=0, endhalf=False, detail=None):
+        '''detail is the game's GameDetail, if the detail stage fetched one.'''
+        frags = self.fragments(game)
+        if game.status != GAME_STATUS_IN:
+            return frags['long']
+
+        output = frags['head']
+        halftime = frags['halftime']
+        if chgHome > 0 and chgAway == 0:
+            sDesc = getScoringDesc(chgHome)
+            if sDesc is not None:
+                output += " | %s" % underline(game.hometeam + " " + sDesc)
+        if chgHome == 0 and chgAway > 0:
+            sDesc = getScoringDesc(chgAway)
+            if sDesc is not None:
+                output += " - %s" % underline(game.awayteam + " " + sDesc)
+        elif chgHome == 0 and chgAway == 0 and not halftime:
+            output += frags['situationEndHalf'] if endhalf else frags['situation']
+            if detail is not None and detail.drive and not endhalf:
+                if game.lastplay is None and detail.play:
+                    output += " (Last play: %s)" % detail.play
+                team = " (%s)" % detail.team if detail.team else ""
+                output += " | Drive%s: %s" % (team, detail.drive)
+
+        if halftime and game.id in self.halftimes:
+            # Estimate time remaining for halftime
+            htimeleft = self.halftimeLength - int(time.time() - self.halftimes[game.id])
+            if htimeleft < 0:
+                htimeleft = 0
+            hm, hs = divmod(htimeleft, 60)
+            output += " (Est. time left: %02d:%02d)" % (hm, hs)
+
+        return output + frags['tv']
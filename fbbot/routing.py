@@ -0,0 +1,168 @@
+from fbbot.scheduler import isCloseFinish
+from fbbot.teamindex import normalize
+
+# ESPN group IDs of the FBS conferences, by the names a route may use
+CONFERENCES = {
+    "acc": "1",
+    "american": "151",
+    "aac": "151",
+    "big 12": "4",
+    "big ten": "5",
+    "b1g": "5",
+    "c-usa": "12",
+    "conference usa": "12",
+    "independents": "18",
+    "mac": "15",
+    "mountain west": "17",
+    "mwc": "17",
+    "pac-12": "9",
+    "sec": "8",
+    "sun belt": "37",
+}
+
+
+class Route(object):
+    '''One channel's filter. A game matches if it passes every filter that is
+    set: either team in teams (names or ESPN team IDs), either team in one
+    of conferences, either team ranked, and, checked per event, a close
+    finish within close points.'''
+
+    __slots__ = ('channel', 'names', 'teamIDs', 'typed', 'conferences', 'ranked', 'close')
+
+    def __init__(self, channel, names=(), teamIDs=(), conferences=(), ranked=False, close=None,
+                 typed=()):
+        self.channel = channel
+        self.names = frozenset(names)
+        self.teamIDs = frozenset(teamIDs)
+        # Team names as configured, matched by resolve() to ESPN's names and IDs
+        self.typed = tuple(typed)
+        self.conferences = frozenset(conferences)
+        self.ranked = ranked
+        self.close = close
+
+    def resolve(self, teams):
+        '''Match the configured team names to ESPN's names and team IDs,
+        which abbrv.json may spell differently ("connecticut" for "UConn").
+        teams is the TeamIndex. Returns True if anything changed.'''
+        names = set(self.names)
+        teamIDs = set(self.teamIDs)
+        for name in self.typed:
+            found = teams.team(name)
+            if found is None:
+                names.add(teams.resolve(name))
+                continue
+            names.add(found[0])
+            if found[1] is not None:
+                teamIDs.add(found[1])
+        if names == self.names and teamIDs == self.teamIDs:
+            return False
+        self.names = frozenset(names)
+        self.teamIDs = frozenset(teamIDs)
+        return True
+
+    def matchesStatic(self, game):
+        '''Check the filters that can't change during a game.'''
+        if (self.names or self.teamIDs) and not (
+                normalize(game.hometeam) in self.names or normalize(game.awayteam) in self.names or
+                game.homeid in self.teamIDs or game.awayid in self.teamIDs):
+            return False
+        if self.conferences and game.homeconf not in self.conferences and \
+                game.awayconf not in self.conferences:
+            return False
+        if self.ranked and not game.ranked():
+            return False
+        return True
+
+
+def parseRoutes(config, teams):
+    '''Build Routes from the routes config: channel -> "all" or a dict with
+    any of teams, conferences, ranked and close. teams is a TeamIndex used to
+    resolve team aliases; see Router.learn().'''
+    routes = []
+    for channel, spec in config.items():
+        if spec == "all" or not spec:
+            routes.append(Route(channel))
+            continue
+        typed = []
+        teamIDs = []
+        for team in spec.get('teams', []):
+            team = str(team)
+            if team.isdigit():
+                teamIDs.append(team)
+            else:
+                typed.append(team)
+        conferences = []
+        for conference in spec.get('conferences', []):
+            conference = str(conference)
+            if conference.isdigit():
+                conferences.append(conference)
+            elif normalize(conference) in CONFERENCES:
+                conferences.append(CONFERENCES[normalize(conference)])
+            else:
+                raise ValueError("Unknown conference %r in route for %s" % (conference, channel))
+        route = Route(channel, (), teamIDs, conferences, ranked=bool(spec.get('ranked', False)),
+                      close=spec.get('close', None), typed=typed)
+        route.resolve(teams)
+        routes.append(route)
+    return routes
+
+
+class Router(object):
+    '''Decides which channels hear about a game.
+
+    The static part of every route is checked once per game, the first time
+    the game is routed, and the result is kept per game ID: the channels the
+    game always goes to, plus the close-game routes it is eligible for. An
+    event is then routed by walking only that game's own list, and only its
+    close-game routes need a check against the current score.'''
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.cache = {}
+
+    def compile(self, game):
+        always = []
+        close = []
+        for route in self.routes:
+            if not route.matchesStatic(game):
+                continue
+            if route.close is None:
+                if route.channel not in always:
+                    always.append(route.channel)
+            else:
+                close.append((route.channel, route.close))
+        # A channel that gets every event doesn't need its close routes
+        close = [(channel, margin) for channel, margin in close if channel not in always]
+        entry = self.cache[game.id] = (tuple(always), tuple(close))
+        return entry
+
+    def targets(self, game):
+        '''Return the channels an event for game should go to.'''
+        entry = self.cache.get(game.id)
+        if entry is None:
+            entry = self.compile(game)
+        always, close = entry
+        if not close:
+            return always
+        targets = list(always)
+        for channel, margin in close:
+            if channel not in targets and isCloseFinish(game, margin):
+                targets.append(channel)
+        return tuple(targets)
+
+    def learn(self, teams):
+        '''Re-resolve the routes' team names, e.g. once a team reaches the
+        board and its ESPN name and ID are known, or after abbrv.json
+        changed. teams is the TeamIndex, rebuilt for the current games.'''
+        changed = False
+        for route in self.routes:
+            if route.typed and route.resolve(teams):
+                changed = True
+        if changed:
+            self.cache.clear()
+
+    def prune(self, games):
+        '''Forget games that are no longer on the board.'''
+        for gameID in list(self.cache):
+            if gameID not in games:
+                del self.cache[gameID]
@@ -0,0 +1,98 @@
+import calendar
+import time
+
+from fbbot.game import GAME_STATUS_PRE, GAME_STATUS_IN
+
+# Reasons returned by PollScheduler.plan()
+SCHEDULE_CLOSE = "close"
+SCHEDULE_LIVE = "live"
+SCHEDULE_HALFTIME = "halftime"
+SCHEDULE_KICKOFF = "kickoff"
+SCHEDULE_IDLE = "idle"
+
+KICKOFF_FORMATS = ('%Y-%m-%dT%H:%MZ', '%Y-%m-%dT%H:%M:%SZ')
+
+
+def parseKickoff(date):
+    '''Parse an ESPN UTC date string ("2017-10-07T16:00Z") to a Unix timestamp.'''
+    for fmt in KICKOFF_FORMATS:
+        try:
+            return calendar.timegm(time.strptime(date, fmt))
+        except ValueError:
+            pass
+    raise ValueError("Unrecognized kickoff date %r" % date)
+
+
+def isCloseFinish(game, margin):
+    '''True for a live game in the 4th quarter or overtime within margin points.'''
+    if game.status != GAME_STATUS_IN:
+        return False
+    if abs(game.homescore - game.awayscore) > margin:
+        return False
+    clock = game.time
+    return "4th" in clock or "OT" in clock
+
+
+class PollScheduler(object):
+    '''Decides how long to wait before the next scoreboard poll.
+
+    Polls quickly while games are live (quicker still for close finishes),
+    backs off while every live game is at halftime, speeds up again shortly
+    before a kickoff, and otherwise sleeps until the next kickoff.'''
+
+    def __init__(self, liveFreq=20, closeFreq=10, halftimeFreq=60, idleFreq=60,
+                 pregameWindow=600, maxSleep=3600, closeMargin=8):
+        self.liveFreq = liveFreq
+        self.closeFreq = closeFreq
+        self.halftimeFreq = halftimeFreq
+        self.idleFreq = idleFreq
+        self.pregameWindow = pregameWindow
+        self.maxSleep = maxSleep
+        self.closeMargin = closeMargin
+        self._kickoffs = {}
+
+    def kickoff(self, game):
+        '''Return a game's kickoff as a Unix timestamp, parsing each date once.'''
+        date = game.date
+        kickoff = self._kickoffs.get(date)
+        if kickoff is None:
+            kickoff = self._kickoffs[date] = parseKickoff(date)
+        return kickoff
+
+    def plan(self, games, now=None):
+        '''Return (delay, reason) for the next poll given the current games.'''
+        if now is None:
+            now = time.time()
+        live = False
+        playing = False
+        nextKickoff = None
+        for game in games.values():
+            status = game.status
+            if status == GAME_STATUS_IN:
+                if isCloseFinish(game, self.closeMargin):
+                    return self.closeFreq, SCHEDULE_CLOSE
+                live = True
+                if game.time != "Halftime":
+                    playing = True
+            elif status == GAME_STATUS_PRE:
+                try:
+                    kickoff = self.kickoff(game)
+                except ValueError:
+                    continue
+                if nextKickoff is None or kickoff < nextKickoff:
+                    nextKickoff = kickoff
+
+        if playing:
+            return self.liveFreq, SCHEDULE_LIVE
+        if live:
+            delay = self.halftimeFreq
+            if nextKickoff is not None and nextKickoff - self.pregameWindow - now < delay:
+                delay = self.liveFreq
+            return delay, SCHEDULE_HALFTIME
+        if nextKickoff is None:
+            return self.maxSleep, SCHEDULE_IDLE
+        if nextKickoff - now <= self.pregameWindow:
+            # Includes games that are late getting started
+            return self.liveFreq, SCHEDULE_KICKOFF
+        delay = min(nextKickoff - self.pregameWindow - now, self.maxSleep)
+        return max(delay, self.idleFreq), SCHEDULE_IDLE
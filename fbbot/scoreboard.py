@@ -0,0 +1,93 @@
+import html
+
+from fbbot.game import Game, GAME_STATUSES, GAME_STATUS_POST
+
+
+def competitorRank(competitor):
+    '''A team's poll rank, or None if it's unranked (ESPN uses 99).'''
+    try:
+        rank = int(competitor['curatedRank']['current'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return rank if 1 <= rank <= 25 else None
+
+
+# Primary magic happens here
+def parseScoreboard(scoreData, league):
+    '''Turn ESPN's scoreboardData into a dict of game ID -> Game.'''
+    games = dict()
+
+    for event in scoreData['events']:
+        competition = event['competitions'][0]
+        status = GAME_STATUSES.get(event['status']['type']['state'], GAME_STATUS_POST)
+        team1 = html.unescape(competition['competitors'][0]['team']['location'])
+        tid1 = competition['competitors'][0]['id']
+        score1 = int(competition['competitors'][0]['score'])
+        team1abv = competition['competitors'][0]['team']['abbreviation']
+        team2 = html.unescape(competition['competitors'][1]['team']['location'])
+        tid2 = competition['competitors'][1]['id']
+        score2 = int(competition['competitors'][1]['score'])
+        team2abv = competition['competitors'][1]['team']['abbreviation']
+
+        # Hawaii workaround
+        if team1 == "Hawai'i":
+            team1 = "Hawaii"
+        if team2 == "Hawai'i":
+            team2 = "Hawaii"
+
+        rank1 = competitorRank(competition['competitors'][0])
+        conf1 = competition['competitors'][0]['team'].get('conferenceId')
+        rank2 = competitorRank(competition['competitors'][1])
+        conf2 = competition['competitors'][1]['team'].get('conferenceId')
+
+        homestatus = competition['competitors'][0]['homeAway']
+
+        if homestatus == 'home':
+            hometeam, homeid, homeabv, homescore, awayteam, awayid, awayabv, awayscore = \
+                team1, tid1, team1abv, score1, team2, tid2, team2abv, score2
+            homerank, homeconf, awayrank, awayconf = rank1, conf1, rank2, conf2
+        else:
+            hometeam, homeid, homeabv, homescore, awayteam, awayid, awayabv, awayscore = \
+                team2, tid2, team2abv, score2, team1, tid1, team1abv, score1
+            homerank, homeconf, awayrank, awayconf = rank2, conf2, rank1, conf1
+
+        network = down = possess = lastplay = odds = None
+        try:
+            network = competition['broadcasts'][0]['names'][0]
+        except:
+            pass
+        try:
+            down = competition['situation']['downDistanceText']
+        except:
+            pass
+        try:
+            possessor = competition['situation']['possession']
+            if possessor == awayid:
+                possess = "away"
+            else:
+                possess = "home"
+        except:
+            pass
+        try:
+            lastplay = competition['situation']['lastPlay']['text']
+        except:
+            pass
+        location = competition['venue']['address']['city']
+        try:
+            location += ", " + competition['venue']['address']['state']
+        except:
+            pass
+
+        try:
+            odds = competition['odds'][0]['details']
+            odds += " (O/U: %s)" % competition['odds'][0]['overUnder']
+        except:
+            pass
+
+        gid = event['id']
+        games[gid] = Game(gid, league, event['date'], status, event['status']['type']['shortDetail'],
+                          location, hometeam, homeid, homeabv, homescore,
+                          awayteam, awayid, awayabv, awayscore,
+                          network=network, down=down, possess=possess, lastplay=lastplay, odds=odds,
+                          homerank=homerank, awayrank=awayrank, homeconf=homeconf, awayconf=awayconf)
+    return games
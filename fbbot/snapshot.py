@@ -0,0 +1,134 @@
+import time
+
+from fbbot.game import Game
+
+KEYFRAME = "keyframe"
+DELTA = "delta.%08d"
+
+
+class Snapshot(object):
+    '''Game state as restored from a SnapshotStore.'''
+
+    def __init__(self, saved, games, halftimes, dedup):
+        self.saved = saved
+        # league name -> {game ID -> Game}
+        self.games = games
+        self.halftimes = halftimes
+        # [(dedup key, time announced)]
+        self.dedup = dedup
+
+
+class SnapshotStore(object):
+    '''Keeps the latest game state in a pyaib db bucket so a restart can pick
+    up where the last run left off.
+
+    Every save is one small row holding only what changed since the previous
+    save: games whose version moved on, game IDs that left the board, new
+    dedup keys, and the current halftime start times. After keyframeEvery
+    deltas, the whole state is written as a keyframe and the deltas are
+    dropped, so the bucket stays small over a season. load() replays the
+    deltas on top of the keyframe.'''
+
+    def __init__(self, bucket, keyframeEvery=100, maxAge=1800):
+        self.bucket = bucket
+        self.keyframeEvery = keyframeEvery
+        self.maxAge = maxAge
+        self.seq = 0
+        self.deltas = 0
+        # The first save of a run is always a keyframe
+        self.started = False
+        # What the stored snapshot holds: league -> {game ID -> version}
+        self.versions = {}
+        self.dedupKeys = set()
+
+    def load(self, now=None):
+        '''Return the stored Snapshot, or None if there is none or it was saved
+        more than maxAge seconds ago.'''
+        if now is None:
+            now = time.time()
+        keyframe = None
+        deltas = []
+        for item in self.bucket.getAll():
+            if item.key == KEYFRAME:
+                keyframe = item.value
+            else:
+                deltas.append(item.value)
+        if keyframe is None:
+            return None
+        deltas.sort(key=lambda delta: delta['seq'])
+
+        games = keyframe['games']
+        halftimes = keyframe['halftimes']
+        dedup = dict((tuple(key), stamp) for key, stamp in keyframe['dedup'])
+        saved = keyframe['saved']
+        self.seq = keyframe['seq']
+        for delta in deltas:
+            if delta['seq'] <= self.seq:
+                # Left over from before the keyframe was written
+                continue
+            for league, changed in delta['changed'].items():
+                games.setdefault(league, {}).update(changed)
+            for league, removed in delta['removed'].items():
+                for gameID in removed:
+                    games.get(league, {}).pop(gameID, None)
+            halftimes = delta['halftimes']
+            dedup.update((tuple(key), stamp) for key, stamp in delta['dedup'])
+            saved = delta['saved']
+            self.seq = delta['seq']
+            self.deltas += 1
+
+        if now - saved > self.maxAge:
+            return None
+        games = dict((league, dict((gameID, Game.unpack(packed)) for gameID, packed in stored.items()))
+                     for league, stored in games.items())
+        return Snapshot(saved, games, halftimes, list(dedup.items()))
+
+    def save(self, leagues, halftimes, dedup, now=None):
+        '''Store the current state. leagues maps league name -> {game ID -> Game},
+        dedup is an AnnounceDedup.'''
+        if now is None:
+            now = time.time()
+        self.seq += 1
+        if not self.started or self.deltas >= self.keyframeEvery:
+            self._keyframe(leagues, halftimes, dedup, now)
+            return
+
+        changed = {}
+        removed = {}
+        for league, games in leagues.items():
+            stored = self.versions.get(league, {})
+            updates = dict((gameID, game.pack()) for gameID, game in games.items()
+                           if stored.get(gameID) != game.version)
+            if updates:
+                changed[league] = updates
+            gone = [gameID for gameID in stored if gameID not in games]
+            if gone:
+                removed[league] = gone
+        for league in self.versions:
+            if league not in leagues:
+                removed[league] = list(self.versions[league])
+        newKeys = [(key, stamp) for key, stamp in dedup.seen.items() if key not in self.dedupKeys]
+
+        self.bucket.set(DELTA % self.seq, {'seq': self.seq, 'saved': now, 'changed': changed,
+                                           'removed': removed, 'halftimes': halftimes,
+                                           'dedup': newKeys})
+        self.deltas += 1
+        self._remember(leagues, dedup)
+
+    def _keyframe(self, leagues, halftimes, dedup, now):
+        old = [item.key for item in self.bucket.getAll() if item.key != KEYFRAME]
+        self.bucket.set(KEYFRAME, {
+            'seq': self.seq, 'saved': now, 'halftimes': halftimes,
+            'games': dict((league, dict((gameID, game.pack()) for gameID, game in games.items()))
+                          for league, games in leagues.items()),
+            'dedup': list(dedup.seen.items())})
+        for key in old:
+            self.bucket.delete(key)
+        self.deltas = 0
+        self.started = True
+        self._remember(leagues, dedup)
+
+    def _remember(self, leagues, dedup):
+        self.versions = dict((league, dict((gameID, game.version) for gameID, game in games.items()))
+                             for league, games in leagues.items())
+        self.dedupKeys = set(dedup.seen)
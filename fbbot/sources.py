@@ -0,0 +1,137 @@
+import datetime
+import gzip
+import json
+import os
+
+from fbbot.extract import extractScoreboard
+from fbbot.httpclient import HttpResponse
+from fbbot.league import LEAGUE_GROUPS
+
+HTML_URL = "http://espn.go.com/college-football/scoreboard/_/group/%(group)s/year/%(season)d/seasontype/%(seasontype)d/"
+JSON_URL = ("http://site.api.espn.com/apis/site/v2/sports/football/college-football/scoreboard"
+            "?groups=%(group)s&dates=%(season)d&seasontype=%(seasontype)d&week=%(week)d&limit=300")
+
+SEASONTYPE_REGULAR = 2
+SEASONTYPE_POST = 3
+# Regular season weeks, counting Army-Navy; anything later is the postseason
+REGULAR_WEEKS = 15
+
+
+def seasonWeek(day=None):
+    '''Return (season, seasontype, week) for a date, the way ESPN numbers
+    them. Week 1 runs through Labor Day and later weeks run Tuesday to
+    Monday. January belongs to the previous season's postseason, and the
+    offseason maps to week 1 of the coming season.'''
+    if day is None:
+        day = datetime.date.today()
+    if day.month == 1:
+        return day.year - 1, SEASONTYPE_POST, 1
+    septFirst = datetime.date(day.year, 9, 1)
+    laborDay = septFirst + datetime.timedelta(days=(7 - septFirst.weekday()) % 7)
+    days = (day - laborDay).days - 1
+    week = 1 if days < 0 else days // 7 + 2
+    if week > REGULAR_WEEKS:
+        return day.year, SEASONTYPE_POST, 1
+    return day.year, SEASONTYPE_REGULAR, week
+
+
+def decodePayload(body):
+    '''Decode a scoreboard payload from any source: a bare JSON scoreboard
+    or an ESPN page with the scoreboard embedded.'''
+    if body.lstrip()[:1] == b'{':
+        return json.loads(body.decode('utf-8'))
+    return extractScoreboard(body)
+
+
+class HtmlSource(object):
+    '''Scrapes the scoreboard JSON embedded in ESPN's scoreboard page.'''
+
+    name = "html"
+
+    def __init__(self, http, url=HTML_URL):
+        self.http = http
+        self.template = url
+
+    def url(self, league, day=None):
+        season, seasontype, week = seasonWeek(day)
+        return self.template % {'group': LEAGUE_GROUPS[league], 'season': season,
+                                'seasontype': seasontype, 'week': week}
+
+    def fetch(self, league):
+        '''Return an HttpResponse for league's scoreboard; notModified is set
+        when there is nothing new to decode.'''
+        return self.http.get(self.url(league))
+
+    def decode(self, body):
+        return extractScoreboard(body)
+
+    def commit(self, response):
+        '''Call once response's games have been applied. Until then the same
+        scoreboard is not reported as unchanged.'''
+        self.http.commit(response)
+
+
+class JsonSource(HtmlSource):
+    '''Fetches ESPN's bare JSON scoreboard API. It carries the same events as
+    the page, at a fraction of the download and with nothing to scrape.'''
+
+    name = "json"
+
+    def __init__(self, http, url=JSON_URL):
+        HtmlSource.__init__(self, http, url)
+
+    def decode(self, body):
+        return json.loads(body.decode('utf-8'))
+
+
+class FileSource(object):
+    '''Reads scoreboards from local files, for tests and offline runs.
+
+    Each league is read from <path>/<league>.json or <league>.html (either may
+    be gzipped), and once committed is reported as not modified until the
+    file changes.'''
+
+    name = "file"
+    SUFFIXES = (".json", ".json.gz", ".html", ".html.gz")
+
+    def __init__(self, path):
+        self.path = path
+        self.seen = {}
+
+    def fetch(self, league):
+        for suffix in self.SUFFIXES:
+            path = os.path.join(self.path, league + suffix)
+            if os.path.exists(path):
+                break
+        else:
+            raise OSError("No %s scoreboard file in %s" % (league, self.path))
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        url = "file://" + os.path.abspath(path)
+        if self.seen.get(league) == stamp:
+            return HttpResponse(url, 304, {}, None, True, 0)
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, 'rb') as f:
+            body = f.read()
+        return HttpResponse(url, 200, {}, body, False, 0, (league, stamp))
+
+    def decode(self, body):
+        return decodePayload(body)
+
+    def commit(self, response):
+        league, stamp = response.validators
+        self.seen[league] = stamp
+
+
+def makeSource(kind, http, url=None, path=None):
+    '''Build the score source named by the source config key.'''
+    if kind == "file":
+        if not path:
+            raise ValueError("source: file needs source_path set")
+        return FileSource(path)
+    sources = {"html": HtmlSource, "json": JsonSource}
+    if kind not in sources:
+        raise ValueError("Unknown score source %r (known: file, html, json)" % kind)
+    if url:
+        return sources[kind](http, url)
+    return sources[kind](http)
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class Timing(object):
+    __slots__ = ('count', 'total', 'last', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class Stats(object):
+    '''Counters, gauges and stage timings for the plugin.
+
+    Safe to update from the fetch threads. Can be rendered as a one-line
+    summary for IRC or in the Prometheus text exposition format.'''
+
+    def __init__(self, prefix="cfbscores"):
+        self.prefix = prefix
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.counters = OrderedDict()
+        self.gauges = OrderedDict()
+        self.timings = OrderedDict()
+
+    def incr(self, name, count=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + count
+
+    def setCounter(self, name, value):
+        '''Set a counter that is kept elsewhere (e.g. the outbound queue's).'''
+        with self._lock:
+            self.counters[name] = value
+
+    def gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = Timing()
+            timing.add(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.time() - start)
+
+    def counter(self, name):
+        return self.counters.get(name, 0)
+
+    def timing(self, name):
+        return self.timings.get(name) or Timing()
+
+    def summary(self):
+        '''Short human-readable summary, one line.'''
+        with self._lock:
+            parts = ["up %dm" % ((time.time() - self.started) // 60)]
+            parts.extend("%s %d" % (name, value) for name, value in self.counters.items())
+            parts.extend("%s %s" % (name, value) for name, value in self.gauges.items())
+            for name, timing in self.timings.items():
+                parts.append("%s %.0f/%.0f/%.0fms" % (name, timing.last * 1000, timing.mean() * 1000,
+                                                     timing.max * 1000))
+        return ", ".join(parts)
+
+    def exposition(self):
+        '''Render everything in the Prometheus text format.'''
+        prefix = self.prefix
+        lines = ["# TYPE %s_uptime_seconds gauge" % prefix,
+                 "%s_uptime_seconds %.0f" % (prefix, time.time() - self.started)]
+        with self._lock:
+            for name, value in self.counters.items():
+                lines.append("# TYPE %s_%s_total counter" % (prefix, name))
+                lines.append("%s_%s_total %d" % (prefix, name, value))
+            for name, value in self.gauges.items():
+                lines.append("# TYPE %s_%s gauge" % (prefix, name))
+                lines.append("%s_%s %s" % (prefix, name, value))
+            for name, timing in self.timings.items():
+                metric = "%s_%s_seconds" % (prefix, name)
+                lines.append("# TYPE %s summary" % metric)
+                lines.append("%s_count %d" % (metric, timing.count))
+                lines.append("%s_sum %.6f" % (metric, timing.total))
+                lines.append("# TYPE %s_last gauge" % metric)
+                lines.append("%s_last %.6f" % (metric, timing.last))
+                lines.append("# TYPE %s_max gauge" % metric)
+                lines.append("%s_max %.6f" % (metric, timing.max))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        '''Atomically write the exposition to path.'''
+        tmp = path + ".tmp"
+        with open(tmp, 'wt') as f:
+            f.write(self.exposition())
+        os.replace(tmp, path)
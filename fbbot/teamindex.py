@@ -0,0 +1,144 @@
+from fbbot.fuzzy import TrigramIndex
+
+# Typo corrections remembered between reloads
+MAX_CORRECTIONS = 1000
+
+
+def normalize(name):
+    '''Lower-case name and collapse runs of whitespace.'''
+    return ' '.join(name.lower().split())
+
+
+def foldAliases(table):
+    '''Fold the abbrv.json table (team name -> list of aliases) into a flat
+    normalized alias -> team name dict.'''
+    aliases = {}
+    for team, abbrvs in table.items():
+        for alias in abbrvs:
+            # First entry wins, same as the old linear scan of abbrv.json
+            aliases.setdefault(normalize(alias), normalize(team))
+    return aliases
+
+
+class TeamIndex(object):
+    '''Maps anything a user might type for a team straight to a game ID.
+
+    aliases is the flat table from foldAliases(). rebuild() is called once
+    per poll with the current games and produces a single dict covering ESPN
+    team names, ESPN abbreviations and every alias of a team that is playing,
+    so a lookup is one normalize() and one dict get.
+
+    Anything not found exactly is looked up in a TrigramIndex of every alias,
+    team name and ESPN name and abbreviation seen so far, and the closest
+    match within a few typos is used instead ("aubrun" -> "auburn"). Those
+    corrections are remembered, so a repeated typo is a dict get too, until
+    a new name is indexed and could be the better match.'''
+
+    def __init__(self, aliases):
+        self.index = {}
+        self.sides = {}
+        self.reload(aliases)
+
+    def reload(self, aliases):
+        '''Switch to a new alias table, e.g. after abbrv.json changed. Call
+        rebuild() afterwards to re-index the games.'''
+        self.aliases = aliases
+        self.names = set(aliases.values())
+        self.fuzzy = TrigramIndex(sorted(set(aliases) | self.names))
+        self.corrections = {}
+        # sides of every team seen on a board since, for teams not playing now
+        self.seen = {}
+
+    def correct(self, name):
+        '''Return the known name closest to the normalized name, or None.'''
+        if name in self.corrections:
+            return self.corrections[name]
+        match = self.fuzzy.best(name)
+        if len(self.corrections) >= MAX_CORRECTIONS:
+            self.corrections = {}
+        self.corrections[name] = match
+        return match
+
+    def resolve(self, name):
+        '''Return the team name an alias (or a typo of one) stands for, or
+        name itself.'''
+        name = normalize(name)
+        if name not in self.aliases and name not in self.names and name not in self.index:
+            name = self.correct(name) or name
+        team = self.aliases.get(name, name)
+        return self.aliases.get(team, team)
+
+    def rebuild(self, games):
+        '''Re-index games, a dict of game ID -> game.'''
+        byName = {}
+        index = {}
+        # Anything typed -> (ESPN team name, ESPN team ID), next to index
+        sides = {}
+        fuzzy = self.fuzzy
+        added = False
+        for gameID, game in games.items():
+            for team, abv, teamID in ((game.hometeam, game.homeabv, game.homeid),
+                                      (game.awayteam, game.awayabv, game.awayid)):
+                team = normalize(team)
+                abv = normalize(abv)
+                index[abv] = gameID
+                sides[abv] = (team, teamID)
+                added = fuzzy.add(abv) | added
+                added = fuzzy.add(team) | added
+        for gameID, game in games.items():
+            for team, teamID in ((game.hometeam, game.homeid), (game.awayteam, game.awayid)):
+                team = normalize(team)
+                byName[team] = gameID
+                sides[team] = (team, teamID)
+        # abbrv.json may know a team by another name than ESPN does ("connecticut"
+        # for ESPN's "UConn"); ESPN's name or abbreviation being one of its
+        # aliases links the two
+        espnNames = list(byName)
+        for key in espnNames + [key for key in sides if key not in byName]:
+            team = self.aliases.get(key)
+            if team is not None and team not in sides:
+                byName[team] = byName.get(key) or index[key]
+                sides[team] = sides[key]
+        # Names beat ESPN abbreviations, aliases beat both
+        index.update(byName)
+        for alias, team in self.aliases.items():
+            if team not in byName and team in self.aliases:
+                # Alias of an alias, e.g. "buckeyes" -> "osu" -> "ohio state"
+                team = self.aliases[team]
+            gameID = byName.get(team)
+            if gameID is not None:
+                index[alias] = gameID
+                sides[alias] = sides[team]
+        self.index = index
+        self.sides = sides
+        self.seen.update(sides)
+        if added:
+            # A typo that matched nothing, or something worse, may match now
+            self.corrections = {}
+
+    def find(self, name):
+        '''Return the ID of the game the named team is in, or None.'''
+        name = normalize(name)
+        gameID = self.index.get(name)
+        if gameID is None and name not in self.aliases and name not in self.names:
+            corrected = self.correct(name)
+            if corrected is not None:
+                gameID = self.index.get(corrected)
+        return gameID
+
+    def team(self, name):
+        '''Return (team name, ESPN team ID) for what a user typed. A team that
+        is or has been on the board is named the way ESPN names it; otherwise
+        the ID is None. Returns None for unknown teams.'''
+        typed = normalize(name)
+        if typed not in self.index and typed not in self.aliases and typed not in self.names:
+            typed = self.correct(typed) or typed
+        resolved = self.resolve(typed)
+        for sides in (self.sides, self.seen):
+            for key in (typed, resolved):
+                side = sides.get(key)
+                if side is not None:
+                    return side
+        if resolved in self.names:
+            return resolved, None
+        return None
@@ -27,28 +27,49 @@
 # THE POSSIBILITY OF SUCH DAMAGE.
 
 import os
+import threading
 import simplejson
 
-def load(location, option):
+# Journal mode: compact once the journal grows past this many bytes
+COMPACT_SIZE = 1024 * 1024
+
+def load(location, option, journal=False, compact_size=COMPACT_SIZE):
     '''Return a pickledb object. location is the path to the json file.'''
-    return pickledb(location, option)
+    return pickledb(location, option, journal, compact_size)
 
 class pickledb(object):
 
-    def __init__(self, location, option):
+    def __init__(self, location, option, journal=False, compact_size=COMPACT_SIZE):
         '''Creates a database object and loads the data from the location path.
-        If the file does not exist it will be created on the first update.'''
+        If the file does not exist it will be created on the first update.
+
+        With journal=True and option (auto-save) on, each mutation appends a
+        one-line record to location + '.journal' instead of rewriting the whole
+        file. The journal is replayed on top of the file on load, and folded
+        back into it in a background thread once it passes compact_size bytes.'''
+        self.journal = journal
+        self.compact_size = compact_size
+        self._jfile = None
+        self._lock = threading.RLock()
+        self._compactor = None
         self.load(location, option)
 
     def load(self, location, option):
         '''Loads, reloads or changes the path to the db file.'''
         location = os.path.expanduser(location)
+        self.close()
         self.loco = location
         self.fsave = option
+        self.jloco = location + '.journal'
+        if self.journal:
+            self._recover()
         if os.path.exists(location):
             self._loaddb()
         else:
             self.db = {}
+        if self.journal:
+            self._replay(self.jloco + '.compacting')
+            self._replay(self.jloco)
         return True
 
     def dump(self):
@@ -56,10 +77,21 @@ class pickledb(object):
         self._dumpdb(True)
         return True
 
+    def close(self):
+        '''Wait for any compaction to finish and close the journal file.'''
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        with self._lock:
+            if self._jfile is not None:
+                self._jfile.close()
+                self._jfile = None
+        return True
+
     def set(self, key, value):
         '''Set the (string,int,whatever) value of a key'''
         self.db[key] = value
-        self._dumpdb(self.fsave)
+        self._save('set', key, value)
         return True
 
     def get(self, key):
@@ -76,25 +108,25 @@ class pickledb(object):
     def rem(self, key):
         '''Delete a key'''
         del self.db[key]
-        self._dumpdb(self.fsave)
+        self._save('rem', key)
         return True
 
     def lcreate(self, name):
         '''Create a list'''
         self.db[name] = []
-        self._dumpdb(self.fsave)
+        self._save('lcreate', name)
         return True
 
     def ladd(self, name, value):
         '''Add a value to a list'''
         self.db[name].append(value)
-        self._dumpdb(self.fsave)
+        self._save('ladd', name, value)
         return True
 
     def lextend(self, name, seq):
         '''Extend a list with a sequence'''
         self.db[name].extend(seq)
-        self._dumpdb(self.fsave)
+        self._save('lextend', name, list(seq))
         return True
 
     def lgetall(self, name):
@@ -109,14 +141,14 @@ class pickledb(object):
         '''Remove a list and all of its values'''
         number = len(self.db[name])
         del self.db[name]
-        self._dumpdb(self.fsave)
+        self._save('rem', name)
         return number
 
     def lpop(self, name, pos):
         '''Remove one value in a list'''
         value = self.db[name][pos]
         del self.db[name][pos]
-        self._dumpdb(self.fsave)
+        self._save('lpop', name, pos)
         return value
 
     def llen(self, name):
@@ -127,26 +159,26 @@ class pickledb(object):
         '''Add more to a key's value'''
         tmp = self.db[key]
         self.db[key] = ('%s%s' % (tmp, more))
-        self._dumpdb(self.fsave)
+        self._save('set', key, self.db[key])
         return True
 
     def lappend(self, name, pos, more):
         '''Add more to a value in a list'''
         tmp = self.db[name][pos]
         self.db[name][pos] = ('%s%s' % (tmp, more))
-        self._dumpdb(self.fsave)
+        self._save('lset', name, pos, self.db[name][pos])
         return True
 
     def dcreate(self, name):
         '''Create a dict'''
         self.db[name] = {}
-        self._dumpdb(self.fsave)
+        self._save('dcreate', name)
         return True
 
     def dadd(self, name, pair):
         '''Add a key-value pair to a dict, "pair" is a tuple'''
         self.db[name][pair[0]] = pair[1]
-        self._dumpdb(self.fsave)
+        self._save('dadd', name, pair[0], pair[1])
         return True
 
     def dget(self, name, key):
@@ -160,14 +192,14 @@ class pickledb(object):
     def drem(self, name):
         '''Remove a dict and all of its pairs'''
         del self.db[name]
-        self._dumpdb(self.fsave)
+        self._save('rem', name)
         return True
 
     def dpop(self, name, key):
         '''Remove one key-value pair in a dict'''
         value = self.db[name][key]
         del self.db[name][key]
-        self._dumpdb(self.fsave)
+        self._save('dpop', name, key)
         return value
 
     def dkeys(self, name):
@@ -188,14 +220,155 @@ class pickledb(object):
     def deldb(self):
         '''Delete everything from the database'''
         self.db= {}
-        self._dumpdb(self.fsave)
+        self._save('deldb')
         return True
 
     def _loaddb(self):
         '''Load or reload the json info from the file'''
-        self.db = simplejson.load(open(self.loco, 'rb'))
+        with open(self.loco, 'rb') as f:
+            self.db = simplejson.load(f)
 
     def _dumpdb(self, forced):
         '''Write/save the json dump into the file'''
         if forced:
-           simplejson.dump(self.db, open(self.loco, 'wt'))
+            compactor = self._compactor
+            if self.journal and compactor is not None:
+                compactor.join()
+            with self._lock:
+                data = simplejson.dumps(self.db)
+                if self.journal:
+                    # Everything in the journal is now in the snapshot
+                    self._rotate()
+            self._write(data)
+
+    def _write(self, data):
+        '''Atomically replace the db file with data, via a temp file. In
+        journal mode the rotated journal is removed once the temp file is
+        safely on disk, but before the rename; see _recover().'''
+        tmp = self.loco + '.tmp'
+        with open(tmp, 'wt') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if self.journal:
+            os.remove(self.jloco + '.compacting')
+        os.replace(tmp, self.loco)
+
+    def _save(self, op, *args):
+        '''Persist one mutation according to the save mode.'''
+        if not self.fsave:
+            return
+        if not self.journal:
+            self._dumpdb(True)
+            return
+        with self._lock:
+            if self._jfile is None:
+                self._jfile = open(self.jloco, 'at')
+            self._jfile.write(simplejson.dumps([op] + list(args)) + '\n')
+            self._jfile.flush()
+            size = self._jfile.tell()
+        if size > self.compact_size and self._compactor is None:
+            self._compact()
+
+    def _compact(self):
+        '''Fold the journal into the db file in a background thread.'''
+        with self._lock:
+            data = simplejson.dumps(self.db)
+            self._rotate()
+
+        def run():
+            try:
+                self._write(data)
+            finally:
+                self._compactor = None
+
+        self._compactor = threading.Thread(target=run, name='pickledb-compact')
+        self._compactor.daemon = True
+        self._compactor.start()
+
+    def _rotate(self):
+        '''Move the live journal aside; new records go to a fresh journal.
+        Caller holds the lock and is about to write a snapshot of self.db.'''
+        if self._jfile is not None:
+            self._jfile.close()
+            self._jfile = None
+        compacting = self.jloco + '.compacting'
+        if os.path.exists(compacting):
+            # An earlier snapshot never finished; keep both sets of records
+            with open(compacting, 'at') as dst:
+                if os.path.exists(self.jloco):
+                    with open(self.jloco, 'rt') as src:
+                        dst.write(src.read())
+            if os.path.exists(self.jloco):
+                os.remove(self.jloco)
+        elif os.path.exists(self.jloco):
+            os.replace(self.jloco, compacting)
+        else:
+            open(compacting, 'wt').close()
+
+    def _recover(self):
+        '''Finish or roll back a snapshot that was interrupted by a crash.
+
+        The snapshot is written to a temp file and the rotated journal is only
+        removed once the temp file is complete, so if the rotated journal is
+        still there the temp file can't be trusted, and if it is gone the temp
+        file holds everything and just needs renaming.'''
+        tmp = self.loco + '.tmp'
+        if not os.path.exists(tmp):
+            return
+        if os.path.exists(self.jloco + '.compacting'):
+            os.remove(tmp)
+        else:
+            os.replace(tmp, self.loco)
+
+    def _replay(self, path):
+        '''Apply the records in a journal file to the in-memory db.
+
+        A crash mid-write can leave a torn record at the end. It is cut off
+        the file, since the next record appended would otherwise join onto
+        it and every record after that would be unreadable too.'''
+        if not os.path.exists(path):
+            return
+        good = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Torn write at the end of the journal
+                    break
+                try:
+                    record = simplejson.loads(line.decode('utf-8'))
+                except ValueError:
+                    break
+                self._apply(record[0], record[1:])
+                good += len(line)
+            torn = f.seek(0, os.SEEK_END) > good
+        if torn:
+            with open(path, 'r+b') as f:
+                f.truncate(good)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _apply(self, op, args):
+        db = self.db
+        if op == 'set':
+            db[args[0]] = args[1]
+        elif op == 'rem':
+            del db[args[0]]
+        elif op == 'lcreate':
+            db[args[0]] = []
+        elif op == 'ladd':
+            db[args[0]].append(args[1])
+        elif op == 'lextend':
+            db[args[0]].extend(args[1])
+        elif op == 'lpop':
+            del db[args[0]][args[1]]
+        elif op == 'lset':
+            db[args[0]][args[1]] = args[2]
+        elif op == 'dcreate':
+            db[args[0]] = {}
+        elif op == 'dadd':
+            db[args[0]][args[1]] = args[2]
+        elif op == 'dpop':
+            del db[args[0]][args[1]]
+        elif op == 'deldb':
+            self.db = {}
@@ -0,0 +1,119 @@
+import time
+
+from fbbot.outqueue import TokenBucket
+
+
+class CommandThrottle(object):
+    '''Per-user and per-channel token buckets for user commands.
+
+    A command is let through only if both its sender and its channel have a
+    token left; private messages only count against the sender. Buckets
+    that have refilled completely are dropped once there are more than
+    maxBuckets of them, since a fresh bucket behaves the same.'''
+
+    def __init__(self, userRate=0.2, userBurst=3, chanRate=1.0, chanBurst=5, maxBuckets=1000):
+        self.userRate = userRate
+        self.userBurst = userBurst
+        self.chanRate = chanRate
+        self.chanBurst = chanBurst
+        self.maxBuckets = maxBuckets
+        self.users = {}
+        self.channels = {}
+        self.allowed = 0
+        self.throttledUsers = 0
+        self.throttledChannels = 0
+
+    def allow(self, nick, channel=None, now=None):
+        if now is None:
+            now = time.time()
+        user = self._bucket(self.users, nick.lower(), self.userRate, self.userBurst, now)
+        if not user.ready(now):
+            self.throttledUsers += 1
+            return False
+        if channel:
+            chan = self._bucket(self.channels, channel, self.chanRate, self.chanBurst, now)
+            if not chan.ready(now):
+                self.throttledChannels += 1
+                return False
+            chan.take()
+        user.take()
+        self.allowed += 1
+        return True
+
+    def _bucket(self, buckets, key, rate, burst, now):
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= self.maxBuckets:
+                self._prune(buckets, now)
+            bucket = buckets[key] = TokenBucket(rate, burst)
+            bucket.stamp = now
+        return bucket
+
+    def _prune(self, buckets, now):
+        for key, bucket in list(buckets.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.burst:
+                del buckets[key]
+
+
+class ReplyCache(object):
+    '''Rendered command replies, and the replies recently sent.
+
+    Replies are cached on a key that includes the game's version (see
+    GameDiff), so a reply is rendered once per change to the game. Entries
+    also expire after ttl seconds, for the parts of a reply that age without
+    the game changing (the halftime countdown, drive details).
+
+    repeated() remembers what was sent where for window seconds, so when a
+    channel asks the same thing over and over it gets one answer.'''
+
+    def __init__(self, ttl=10, window=10, maxSize=500):
+        self.ttl = ttl
+        self.window = window
+        self.maxSize = maxSize
+        self.replies = {}
+        self.sent = {}
+        self.hits = 0
+        self.misses = 0
+        self.suppressed = 0
+
+    def get(self, key, now=None):
+        if now is None:
+            now = time.time()
+        entry = self.replies.get(key)
+        if entry is not None and now - entry[1] < self.ttl:
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        return None
+
+    def put(self, key, reply, now=None):
+        if now is None:
+            now = time.time()
+        if len(self.replies) >= self.maxSize:
+            for old, (_, stamp) in list(self.replies.items()):
+                if now - stamp >= self.ttl:
+                    del self.replies[old]
+            if len(self.replies) >= self.maxSize:
+                # Everything is recent; start over rather than grow without bound
+                self.replies.clear()
+        self.replies[key] = (reply, now)
+
+    def repeated(self, target, reply, now=None):
+        '''True if reply already went to target within the window; otherwise
+        record it as sent.'''
+        if now is None:
+            now = time.time()
+        key = (target, reply)
+        stamp = self.sent.get(key)
+        if stamp is not None and now - stamp < self.window:
+            self.suppressed += 1
+            return True
+        if len(self.sent) >= self.maxSize:
+            for old, stamp in list(self.sent.items()):
+                if now - stamp >= self.window:
+                    del self.sent[old]
+            if len(self.sent) >= self.maxSize:
+                self.sent.clear()
+        self.sent[key] = now
+        return False
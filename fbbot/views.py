@@ -0,0 +1,84 @@
+from fbbot.game import GAME_STATUS_PRE, GAME_STATUS_IN
+
+# View names
+VIEW_LIVE = "live"
+VIEW_TV = "tv"
+VIEW_CLOSE = "close"
+VIEW_UPCOMING = "upcoming"
+VIEW_RANKED = "ranked"
+
+VIEWS = (VIEW_LIVE, VIEW_TV, VIEW_CLOSE, VIEW_UPCOMING, VIEW_RANKED)
+
+
+class GameViews(object):
+    '''Keeps the board sorted into the lists the query commands show.
+
+    live: games in progress; tv: those of them on TV; close: those within
+    closeMargin points; upcoming: games not yet started; ranked: games with a
+    top 25 team that aren't over. Every list is in kickoff order.
+
+    update() is called with the merged board after every poll and only
+    re-sorts games whose version (see GameDiff) moved since the last call.
+    A view's ordered list is rebuilt on the first read after its membership
+    changes, so a command costs the size of its answer, not of the board.'''
+
+    def __init__(self, closeMargin=10):
+        self.closeMargin = closeMargin
+        self.versions = {}
+        self.members = {}
+        self.views = dict((name, {}) for name in VIEWS)
+        self.ordered = {}
+
+    def update(self, games):
+        for gameID, game in games.items():
+            if game.version is None or self.versions.get(gameID) != game.version:
+                self._place(gameID, self.classify(game), (game.date, gameID))
+                self.versions[gameID] = game.version
+        if len(self.versions) > len(games):
+            # Some games left the board
+            for gameID in [gameID for gameID in self.versions if gameID not in games]:
+                self._place(gameID, (), None)
+                del self.versions[gameID]
+
+    def classify(self, game):
+        '''Return the names of the views game belongs in.'''
+        if game.status == GAME_STATUS_IN:
+            names = [VIEW_LIVE]
+            if game.network is not None:
+                names.append(VIEW_TV)
+            if abs(game.homescore - game.awayscore) <= self.closeMargin:
+                names.append(VIEW_CLOSE)
+        elif game.status == GAME_STATUS_PRE:
+            names = [VIEW_UPCOMING]
+        else:
+            return ()
+        if game.ranked():
+            names.append(VIEW_RANKED)
+        return tuple(names)
+
+    def get(self, name, games, limit=None):
+        '''Return the games in view name, in kickoff order. games is the
+        board last passed to update().'''
+        ordered = self.ordered.get(name)
+        if ordered is None:
+            view = self.views[name]
+            ordered = self.ordered[name] = sorted(view, key=view.get)
+        if limit is not None:
+            ordered = ordered[:limit]
+        return [games[gameID] for gameID in ordered]
+
+    def _place(self, gameID, names, sortKey):
+        old = self.members.get(gameID, ())
+        for name in old:
+            if name not in names:
+                del self.views[name][gameID]
+                self.ordered.pop(name, None)
+        for name in names:
+            view = self.views[name]
+            if view.get(gameID) != sortKey:
+                view[gameID] = sortKey
+                self.ordered.pop(name, None)
+        if names:
+            self.members[gameID] = names
+        else:
+            self.members.pop(gameID, None)
@@ -0,0 +1,91 @@
+"""Poll ESPN once and feed the scores to every bot on this machine.
+
+Usage: python footballfetcher.py [footballbot.conf]
+
+Reads the plugin.cfbscores section of the bot config, polls the configured
+leagues on the same schedule a bot would, and publishes the parsed games on
+the Unix socket named by feed_socket. Bots with the same feed_socket setting
+subscribe to it instead of polling ESPN themselves.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import time
+
+from pyaib.config import Config
+
+from fbbot.datacache import DataCache
+from fbbot.feed import FeedPublisher
+from fbbot.httpclient import HttpClient
+from fbbot.league import League
+from fbbot.scheduler import PollScheduler
+from fbbot.scoreboard import parseScoreboard
+from fbbot.sources import makeSource
+
+
+def fetch(source, league):
+    '''Return league's games, or None if the scoreboard hasn't changed.'''
+    resp = source.fetch(league.name)
+    if resp.notModified:
+        return None
+    games = parseScoreboard(source.decode(resp.body), league.name)
+    source.commit(resp)
+    return games
+
+
+def run(config):
+    path = config.get('feed_socket')
+    if not path:
+        print("Set feed_socket in plugin.cfbscores to the socket path to publish on")
+        return 1
+    ua = config.get('user_agent') or DataCache(config.get('data_cache', "cfbscores.cache")).load()['useragent']
+    pollFreq = config.get('poll_freq', 20)
+    http = HttpClient(ua, config.get('fetch_timeout', 15))
+    source = makeSource(config.get('source', "html"), http,
+                        url=config.get('source_url'), path=config.get('source_path'))
+    leagues = [League(name) for name in config.get('leagues', ["fbs"])]
+    pool = ThreadPoolExecutor(max_workers=config.get('fetch_workers', 4))
+    scheduler = PollScheduler(liveFreq=pollFreq,
+                              closeFreq=config.get('close_freq', 10),
+                              halftimeFreq=config.get('halftime_freq', 60),
+                              idleFreq=config.get('inactive_freq', 60),
+                              pregameWindow=config.get('pregame_window', 600),
+                              maxSleep=config.get('max_sleep', 3600))
+    publisher = FeedPublisher(path)
+    print("Publishing %s scores on %s" % (', '.join(league.name for league in leagues), path))
+
+    try:
+        while True:
+            started = time.time()
+            futures = [(league, pool.submit(fetch, source, league)) for league in leagues]
+            failed = False
+            for league, future in futures:
+                try:
+                    games = future.result()
+                except Exception as ex:
+                    print("Error retrieving %s scores: %s" % (league.name, ex))
+                    publisher.error(league.name, ex)
+                    failed = True
+                    continue
+                if games is not None:
+                    league.games = games
+                    sent = publisher.publish(league.name, games, started)
+                    if sent:
+                        print("Published %d changed %s games to %d bots"
+                              % (sent, league.name, len(publisher.clients)))
+            allGames = {}
+            for league in leagues:
+                allGames.update(league.games)
+            delay, _ = scheduler.plan(allGames)
+            if failed:
+                delay = min(delay, pollFreq)
+            time.sleep(max(0, started + delay - time.time()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        publisher.close()
+    return 0
+
+
+argv = sys.argv[1:]
+config = Config(argv[0] if argv else 'footballbot.conf').config
+sys.exit(run(config.get('plugin.cfbscores')))
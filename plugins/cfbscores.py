@@ -1,378 +1,550 @@
+import functools
 import time
-from urllib.request import urlopen, Request
-import json
-import html
-from collections import deque
-import fbbot.thirdparty.pickledb
-from dateutil import tz, parser as dateparser
-from fake_useragent import UserAgent
+from concurrent.futures import ThreadPoolExecutor
 from pyaib.plugins import every, keyword, plugin_class
-from fbbot.thirdparty.ircformat import bold, underline
+from fbbot.fetcher import BackgroundFetch
+from fbbot.feed import FeedSubscriber
+from fbbot.httpclient import HttpClient
+from fbbot.details import DetailFetcher, DETAIL_URL
+from fbbot.scoreboard import parseScoreboard
+from fbbot.sources import makeSource
+from fbbot.teamindex import TeamIndex
+from fbbot.datacache import DataCache
+from fbbot.oddsstore import OddsStore
+from fbbot.render import GameRenderer
+from fbbot.dedup import AnnounceDedup
+from fbbot.recorder import PayloadRecorder
+from fbbot.snapshot import SnapshotStore
+from fbbot.follows import FollowStore
+from fbbot.routing import Route, Router, parseRoutes
+from fbbot.throttle import CommandThrottle, ReplyCache
+from fbbot.views import GameViews, VIEW_TV, VIEW_CLOSE, VIEW_UPCOMING, VIEW_RANKED
+from fbbot.stats import Stats
+from fbbot.outqueue import OutboundQueue, PRIORITY_SCORE, PRIORITY_UPDATE, PRIORITY_DEBUG
+from fbbot.game import GAME_STATUS_IN, GAME_STATUS_POST
+from fbbot.league import League
+from fbbot.gamediff import EVENT_STATUS, EVENT_SCORE, EVENT_HALFTIME_START, \
+    EVENT_HALFTIME_END, EVENT_ODDS
+from fbbot.scheduler import PollScheduler, SCHEDULE_CLOSE, SCHEDULE_LIVE, SCHEDULE_HALFTIME, \
+    SCHEDULE_KICKOFF, SCHEDULE_IDLE
 
 #Constants
-MODE_ACTIVE = 0
-MODE_INACTIVE = 1
-GAME_STATUS_PRE = 0
-GAME_STATUS_IN = 1
-GAME_STATUS_POST = 2
-
-def convertDateToEastern(date):
-    to_zone = tz.gettz('America/New_York')
-    utc = dateparser.parse(date)
-    eastern = utc.astimezone(to_zone)
-    return eastern.strftime('%A, %B %d, %I:%M %p %Z')
+FETCH_TIMEOUT = 15
+FETCH_WORKERS = 4
+POLL_FREQ = 20
+SCHEDULE_MESSAGES = {
+    SCHEDULE_CLOSE: "Close game winding down. Updating scores every %d seconds.",
+    SCHEDULE_LIVE: "At least one game is active. Updating scores every %d seconds.",
+    SCHEDULE_HALFTIME: "All active games are at halftime. Updating scores every %d seconds.",
+    SCHEDULE_KICKOFF: "A game is about to kick off. Updating scores every %d seconds.",
+    SCHEDULE_IDLE: "All games are inactive. Next update in %d seconds.",
+}
+
+def throttled(handler):
+    '''Drop a command whose sender or channel is over its rate.'''
+    @functools.wraps(handler)
+    def wrapper(self, irc_c, msg, trigger, args, kargs):
+        if not self.throttle.allow(msg.sender.nick, msg.channel):
+            print("!%s from %s in %s throttled" % (trigger, msg.sender.nick, msg.channel or "PM"))
+            return
+        return handler(self, irc_c, msg, trigger, args, kargs)
+    return wrapper
+
 
 @plugin_class
+@plugin_class.requires('db')
 class CFBScores:
 
     def __init__(self, irc_context, config):
+        started = time.time()
         self.config = config
         print(self.config)
-        self.ua = UserAgent().chrome
+        # Team aliases and the user agent come from one precompiled cache file
+        self.dataCache = DataCache(self.config.get('data_cache', "cfbscores.cache"))
+        self.data = self.dataCache.load()
+        self.ua = self.config.get('user_agent') or self.data['useragent']
         self.lastUpdate = 0
-        self.mode = MODE_ACTIVE
-        self.fbs = {}
-        self.fbsOdds = fbbot.thirdparty.pickledb.load('oddsCache.db', False)
+        self.nextUpdate = 0
+        self.schedule = SCHEDULE_LIVE
+        self.leagues = [League(name) for name in self.config.get('leagues', ["fbs"])]
+        # Merged view of every league's games, for commands
+        self.games = {}
+        # Live/on TV/close/upcoming/ranked lists, kept up to date as polls come in
+        self.views = GameViews(closeMargin=self.config.get('close_margin', 10))
+        self.listLimit = self.config.get('list_limit', 10)
+        # Users spamming commands are throttled, and a channel asking the same
+        # thing over and over gets one rendered answer
+        self.throttle = CommandThrottle(userRate=self.config.get('throttle_user_rate', 0.2),
+                                        userBurst=self.config.get('throttle_user_burst', 3),
+                                        chanRate=self.config.get('throttle_chan_rate', 1.0),
+                                        chanBurst=self.config.get('throttle_chan_burst', 5))
+        self.replies = ReplyCache(ttl=self.config.get('reply_ttl', 10),
+                                  window=self.config.get('reply_window', 10))
+        self.odds = OddsStore(irc_context.db.get('plugin.cfbscores.odds'),
+                              flushFreq=self.config.get('odds_flush_freq', 300),
+                              expireDays=self.config.get('odds_expire_days', 7))
+        imported = self.odds.importPickle('oddsCache.db')
+        if imported:
+            print("Imported %d cached odds from oddsCache.db" % imported)
+        self.metrics = Stats()
+        self.metricsFile = self.config.get('metrics_file')
+        self.metricsFreq = self.config.get('metrics_freq', 60)
+        self.lastMetrics = 0
         self.halftimes = {}
-        self.recentAnnounce = deque(maxlen=100)
-
-        self.abbrv = json.load(open("abbrv.json"))
+        self.renderer = GameRenderer(self.halftimes)
+        self.recentAnnounce = AnnounceDedup(ttl=self.config.get('dedup_ttl', 1800),
+                                            maxSize=self.config.get('dedup_size', 500))
+        self.outbox = OutboundQueue(rate=self.config.get('send_rate', 0.5),
+                                    burst=self.config.get('send_burst', 3),
+                                    globalRate=self.config.get('send_global_rate', 1.0),
+                                    globalBurst=self.config.get('send_global_burst', 5),
+                                    batch=self.config.get('batch_updates', False),
+                                    observe=lambda secs: self.metrics.observe('announce_latency', secs))
+        self.pollFreq = self.config.get('poll_freq', POLL_FREQ)
+        self.fetchTimeout = self.config.get('fetch_timeout', FETCH_TIMEOUT)
+        self.scheduler = PollScheduler(liveFreq=self.pollFreq,
+                                       closeFreq=self.config.get('close_freq', 10),
+                                       halftimeFreq=self.config.get('halftime_freq', 60),
+                                       idleFreq=self.config.inactive_freq,
+                                       pregameWindow=self.config.get('pregame_window', 600),
+                                       maxSleep=self.config.get('max_sleep', 3600))
+        self.pool = ThreadPoolExecutor(max_workers=self.config.get('fetch_workers', FETCH_WORKERS))
+        self.fetcher = BackgroundFetch(self.fetchLeagues, self.fetchTimeout)
+        self.http = HttpClient(self.ua, self.fetchTimeout)
+        # Where scoreboards come from: html (the ESPN page), json (ESPN's
+        # scoreboard API) or file (local fixtures under source_path)
+        self.source = makeSource(self.config.get('source', "html"), self.http,
+                                 url=self.config.get('source_url'), path=self.config.get('source_path'))
+        # With feed_socket set, games come from a shared footballfetcher.py
+        # process instead of this bot polling ESPN itself
+        self.feed = None
+        if self.config.get('feed_socket'):
+            self.feed = FeedSubscriber(self.config.feed_socket)
+        # Optional drive details for live games, fetched from the per-game summaries
+        self.details = None
+        if self.config.get('details', False):
+            self.details = DetailFetcher(self.http, url=self.config.get('detail_url', DETAIL_URL),
+                                         workers=self.config.get('detail_workers', 4),
+                                         ttl=self.config.get('detail_ttl', 60),
+                                         margin=self.config.get('detail_margin', None))
+        self.recorder = None
+        if self.config.get('record_dir'):
+            self.recorder = PayloadRecorder(self.config.record_dir)
+
+        self.abbrv = self.data['abbrv']
+        self.teams = TeamIndex(self.data['aliases'])
+        # live_chans get every announcement; routes add filtered channels
+        routes = [Route(channel) for channel in self.config.get('live_chans', [])]
+        routes.extend(parseRoutes(self.config.get('routes', {}), self.teams))
+        self.router = Router(routes)
+        self.follows = FollowStore(irc_context.db.get('plugin.cfbscores.follows'),
+                                   limit=self.config.get('follow_limit', 10))
+        self.snapshots = SnapshotStore(irc_context.db.get('plugin.cfbscores.snapshots'),
+                                       keyframeEvery=self.config.get('snapshot_keyframe', 100),
+                                       maxAge=self.config.get('snapshot_max_age', 1800))
+        self.restoreSnapshot()
+        startup = time.time() - started
+        self.metrics.observe('startup', startup)
+        print("cfbscores: Started in %.0f ms" % (startup * 1000))
+
+    # Pick up the games, halftimes and announced events of the last run, so
+    # changes made while the bot was down are announced on the first poll.
+    def restoreSnapshot(self):
+        snapshot = self.snapshots.load()
+        if snapshot is None:
+            return
+        for league in self.leagues:
+            league.restore(snapshot.games.get(league.name, {}))
+        self.mergeGames()
+        self.halftimes.update(snapshot.halftimes)
+        self.recentAnnounce.restore(snapshot.dedup)
+        print("cfbscores: Restored %d games from %.0f seconds ago"
+              % (len(self.games), time.time() - snapshot.saved))
+
+    def saveSnapshot(self):
+        with self.metrics.timer('snapshot'):
+            self.snapshots.save(dict((league.name, league.games) for league in self.leagues),
+                                self.halftimes, self.recentAnnounce)
+
+    def mergeGames(self):
+        games = {}
+        for league in self.leagues:
+            games.update(league.games)
+        self.games = games
+        self.teams.rebuild(games)
+        self.follows.learn(self.teams)
+        self.router.learn(self.teams)
+        self.renderer.prune(games)
+        self.router.prune(games)
+        self.views.update(games)
 
     def ircLog(self, irc_c, msg):
         print("cfbscores: " + msg)
-        irc_c.PRIVMSG(self.config.debug_chan, msg)
-
-    @every(20, "scoreupdate")
-    def updateScores(self, irc_c, event):
-        curTime = time.time()
-        if self.mode == MODE_INACTIVE:
-            if curTime - self.lastUpdate < self.config.inactive_freq:
-                return
+        self.outbox.put(self.config.debug_chan, msg, PRIORITY_DEBUG)
+
+    @every(1, "sendqueue")
+    def sendQueued(self, irc_c, event):
+        self.outbox.drain(irc_c.PRIVMSG)
+        if self.metricsFile and time.time() - self.lastMetrics >= self.metricsFreq:
+            self.lastMetrics = time.time()
+            self.syncMetrics()
+            try:
+                self.metrics.write(self.metricsFile)
+            except OSError as ex:
+                print("cfbscores: Can't write metrics to %s: %s" % (self.metricsFile, ex))
+
+    # Copy counters that live in other objects into the stats
+    def syncMetrics(self):
+        self.metrics.setCounter('messages_queued', self.outbox.queued)
+        self.metrics.setCounter('messages_sent', self.outbox.sent)
+        self.metrics.setCounter('messages_coalesced', self.outbox.coalesced)
+        self.metrics.setCounter('messages_batched', self.outbox.batched)
+        self.metrics.setCounter('announcements_suppressed', self.recentAnnounce.suppressed)
+        self.metrics.setCounter('commands_throttled_user', self.throttle.throttledUsers)
+        self.metrics.setCounter('commands_throttled_channel', self.throttle.throttledChannels)
+        self.metrics.setCounter('reply_cache_hits', self.replies.hits)
+        self.metrics.setCounter('reply_cache_misses', self.replies.misses)
+        self.metrics.setCounter('replies_suppressed', self.replies.suppressed)
+        self.metrics.gauge('queue_depth', len(self.outbox))
+        self.metrics.gauge('games', len(self.games))
+        self.metrics.gauge('followers', len(self.follows))
+        if self.feed is not None:
+            self.metrics.gauge('feed_connected', int(self.feed.connected))
+        if self.details is not None:
+            self.metrics.setCounter('details_fetched', self.details.fetched)
+            self.metrics.setCounter('detail_errors', self.details.errors)
+            self.metrics.setCounter('details_cancelled', self.details.cancelled)
+
+    @keyword("stats")
+    def stats(self, irc_c, msg, trigger, args, kargs):
+        if msg.channel != self.config.debug_chan.lower():
+            return
+        self.syncMetrics()
+        msg.reply(self.metrics.summary())
 
-        newData = {}
+    # Pick up edits to abbrv.json without a restart
+    @every(10, "datareload")
+    def reloadData(self, irc_c, event):
+        if not self.dataCache.changed():
+            return
         try:
-            newData = self.getGames("fbs")
-        except Exception as ex:
-            self.ircLog(irc_c, "Error retrieving scores: " + str(ex))
-            self.lastUpdate = curTime
+            self.data = self.dataCache.load()
+        except (OSError, ValueError) as ex:
+            self.ircLog(irc_c, "Error reloading abbrv.json: %s" % ex)
+            return
+        self.abbrv = self.data['abbrv']
+        self.teams.reload(self.data['aliases'])
+        self.teams.rebuild(self.games)
+        self.follows.learn(self.teams)
+        self.router.learn(self.teams)
+        self.ircLog(irc_c, "Reloaded %d team aliases from abbrv.json" % len(self.data['aliases']))
+
+    # The timer only starts fetches and swaps in finished ones; the network
+    # request itself runs in the background so commands never wait on ESPN.
+    @every(2, "scoreupdate")
+    def updateScores(self, irc_c, event):
+        if self.feed is not None:
+            results = self.feed.collect(self.leagues)
+            if results:
+                self.lastUpdate = time.time()
+                self.metrics.incr('feed_updates')
+                self.applyScores(irc_c, results)
             return
 
-        activeGames = False
-        for gameID in newData.keys():
-            newGame = newData[gameID]
-            if newGame['status'] == GAME_STATUS_IN:
-                # One game is active, at least
-                activeGames = True
-            if gameID not in self.fbs:
-                # New game - if active, send status
-                #if newGame['status'] == GAME_STATUS_IN:
-                #    self.announceScore(irc_c, newGame)
-                continue
-            oldGame = self.fbs[gameID]
+        finished = self.fetcher.collect()
+        if finished is not None:
+            results, error, duration = finished
+            self.metrics.incr('polls')
+            self.metrics.observe('poll', duration)
+            if error is not None:
+                self.metrics.incr('poll_errors')
+                self.ircLog(irc_c, "Error retrieving scores: " + str(error))
+                self.nextUpdate = self.lastUpdate + self.pollFreq
+            else:
+                self.applyScores(irc_c, results)
 
+        curTime = time.time()
+        if curTime < self.nextUpdate:
+            return
+        if self.fetcher.start():
+            self.lastUpdate = curTime
+            # Replaced by schedulePoll once the fetch finishes
+            self.nextUpdate = curTime + self.pollFreq
+
+    # Runs on the fetch thread: poll every league in parallel on the worker pool.
+    # Returns a list of (league, games, error, response) in league order.
+    def fetchLeagues(self):
+        futures = [(league, self.pool.submit(self.getGames, league.name)) for league in self.leagues]
+        results = []
+        for league, future in futures:
+            try:
+                games, resp = future.result()
+                results.append((league, games, None, resp))
+            except Exception as ex:
+                results.append((league, None, ex, None))
+        return results
+
+    def schedulePoll(self, irc_c, retry=False):
+        delay, reason = self.scheduler.plan(self.games)
+        if retry:
+            delay = min(delay, self.pollFreq)
+        self.nextUpdate = self.lastUpdate + delay
+        if reason != self.schedule:
+            self.ircLog(irc_c, SCHEDULE_MESSAGES[reason] % delay)
+            self.schedule = reason
+
+    def applyScores(self, irc_c, results):
+        changed = False
+        failed = False
+        for league, newData, error, resp in results:
+            if error is not None:
+                self.metrics.incr('fetch_errors')
+                self.ircLog(irc_c, "Error retrieving %s scores: %s" % (league.name, error))
+                failed = True
+            elif newData is not None:
+                # None means ESPN had nothing new for us
+                with self.metrics.timer('diff'):
+                    events = league.apply(newData)
+                self.metrics.incr('changes', len(events))
+                with self.metrics.timer('announce'):
+                    for ev in events:
+                        self.handleEvent(irc_c, ev)
+                changed = True
+                if resp is not None:
+                    # Only now is this scoreboard safe to call unchanged
+                    self.source.commit(resp)
+
+        if changed:
+            self.mergeGames()
+            self.saveSnapshot()
+        if self.details is not None:
+            with self.metrics.timer('details'):
+                self.details.update(self.games)
+        self.odds.flush()
+        self.schedulePoll(irc_c, retry=failed)
+        # Everything this poll announced is queued; send what we can right away
+        self.outbox.drain(irc_c.PRIVMSG)
+
+    def handleEvent(self, irc_c, ev):
+        game = ev.game
+        gameID = ev.gameID
+        if ev.kind == EVENT_ODDS:
             # Cache betting lines
-            cachedOdds = self.fbsOdds.get(gameID)
-            if "odds" in newGame and (cachedOdds is None or cachedOdds != newGame['odds']):
-                print("Cached odds for %s: %s" % (gameID, newGame['odds']))
-                self.fbsOdds.set(gameID, newGame['odds'])
-
-            # Check for state change
-            if newGame['status'] != oldGame['status']:
-                if newGame['status'] == GAME_STATUS_IN:
-                    # TODO: Make sure ESPN isn't messing with us. Cache past status for this game?
-                    self.announceScore(irc_c, newGame, prefix="Game Started: ")
-                elif newGame['status'] == GAME_STATUS_POST:
-                    self.announceScore(irc_c, newGame, prefix="Game Ended: ")
-                continue
-
-            # Halftime
-            if newGame['time'] == "Halftime" and newGame['time'] != oldGame['time']:
-                self.announceScore(irc_c, newGame)
-                self.halftimes[gameID] = time.time()
-            # After halftime
-            if oldGame['time'] == "Halftime" and newGame['time'] != oldGame['time']:
-                self.announceScore(irc_c, newGame, endhalf=True)
-                if gameID in self.halftimes:
-                    del self.halftimes[gameID]
-
-            if newGame['status'] == GAME_STATUS_IN:
-                chgHome = newGame['homescore'] - oldGame['homescore']
-                chgAway = newGame['awayscore'] - oldGame['awayscore']
-                if chgHome > 0 or chgAway > 0:
-                    self.announceScore(irc_c, newGame, chgHome, chgAway)
-
-        self.fbs = newData
-        if activeGames and self.mode == MODE_INACTIVE:
-            self.ircLog(irc_c, "At least one game is active. Updating scores every 10 seconds.")
-            self.mode = MODE_ACTIVE
-        elif not activeGames and self.mode == MODE_ACTIVE:
-            self.ircLog(irc_c, "All games are inactive. Updating scores every %d seconds until another game becomes active."
-                        % self.config.inactive_freq)
-            self.mode = MODE_INACTIVE
-
-        self.lastUpdate = curTime
-        self.fbsOdds.dump()
-
-    def getScoringDesc(self, change):
-        if change == 1:
-            return "Extra Point GOOD"
-        elif change == 2:
-            return "+2 Points"
-        elif change == 3:
-            return "Field Goal GOOD!"
-        elif change == 6:
-            return "TOUCHDOWN!"
-        elif change == 7:
-            return "TOUCHDOWN! (+XP GOOD)"
-        elif change == 8:
-            return "TOUCHDOWN! (+2 PT GOOD)"
-        else:
-            return None
-
-    def deAbbreviate(self, team):
-        for abteam, abbrvs in self.abbrv.items():
-            if team.lower() in abbrvs:
-                print("Converted %s to %s (abbreviation)" % (team, abteam))
-                team = abteam
-                break
-        return team
+            if self.odds.set(gameID, game.odds):
+                print("Cached odds for %s: %s" % (gameID, game.odds))
+        elif ev.kind == EVENT_STATUS:
+            if game.status == GAME_STATUS_IN:
+                # TODO: Make sure ESPN isn't messing with us. Cache past status for this game?
+                self.announceScore(irc_c, game, prefix="Game Started: ", kind=ev.kind,
+                                   priority=PRIORITY_SCORE)
+            elif game.status == GAME_STATUS_POST:
+                if self.details is not None:
+                    # Stop fetching now rather than at the end of the poll,
+                    # and keep the last drive out of the final score
+                    self.details.cancel(gameID)
+                self.announceScore(irc_c, game, prefix="Game Ended: ", kind=ev.kind,
+                                   priority=PRIORITY_SCORE)
+                self.odds.finished(gameID)
+        elif ev.kind == EVENT_HALFTIME_START:
+            self.announceScore(irc_c, game, kind=ev.kind)
+            self.halftimes[gameID] = time.time()
+        elif ev.kind == EVENT_HALFTIME_END:
+            self.announceScore(irc_c, game, endhalf=True, kind=ev.kind)
+            if gameID in self.halftimes:
+                del self.halftimes[gameID]
+        elif ev.kind == EVENT_SCORE:
+            self.announceScore(irc_c, game, ev.chgHome, ev.chgAway, kind=ev.kind,
+                               priority=PRIORITY_SCORE)
 
     @keyword("score", "sc", "s")
+    @throttled
     def score(self, irc_c, msg, trigger, args, kargs):
         team = ' '.join(args).lower()
         print("!score - %s - %s" % (msg.sender, team))
-        team = self.deAbbreviate(team)
-        for gameid, game in self.fbs.items():
-            if team == game['hometeam'].lower() or \
-                 team == game['awayteam'].lower():
-                msg.reply(self.getLongGameDesc(game))
-                return
-        msg.reply("%s: Can't find a game for that team (%s)." % (msg.sender.nick, team))
+        gameid = self.teams.find(team)
+        if gameid is None:
+            msg.reply("%s: Can't find a game for that team (%s)." % (msg.sender.nick, self.teams.resolve(team)))
+            return
+        game = self.games[gameid]
+        self.reply(msg, self.cachedReply('score', game, lambda: self.getLongGameDesc(game)))
 
     @keyword("odds", "line", "spread", "l", "o")
+    @throttled
     def line(self, irc_c, msg, trigger, args, kargs):
         team = ' '.join(args).lower()
         print("!line - %s - %s" % (msg.sender, team))
-        team = self.deAbbreviate(team)
-        for gameid, game in self.fbs.items():
-            if team == game['hometeam'].lower() or \
-                            team == game['awayteam'].lower():
-                if "odds" in game:
-                    msg.reply("%s @ %s Odds: %s " % (game['awayteam'], game['hometeam'], game['odds']))
-                elif self.fbsOdds.get(gameid) is not None:
-                    # Cached
-                    print("Retrieved cached odds for %s" % gameid)
-                    msg.reply("%s @ %s Odds: %s " % (game['awayteam'], game['hometeam'], self.fbsOdds.get(gameid)))
-                else:
-                    msg.reply("%s: No odds available for %s @ %s." % (msg.sender.nick,
-                                                                      game['awayteam'], game['hometeam']))
-                return
-        msg.reply("%s: Can't find a game for that team (%s)." % (msg.sender.nick, team))
+        gameid = self.teams.find(team)
+        if gameid is None:
+            msg.reply("%s: Can't find a game for that team (%s)." % (msg.sender.nick, self.teams.resolve(team)))
+            return
+        game = self.games[gameid]
+        reply = self.cachedReply('line', game, lambda: self.getLineDesc(game))
+        if reply is not None:
+            self.reply(msg, reply)
+        else:
+            msg.reply("%s: No odds available for %s @ %s." % (msg.sender.nick,
+                                                              game.awayteam, game.hometeam))
+
+    # Returns None if there are no odds for the game.
+    def getLineDesc(self, game):
+        if game.odds is not None:
+            return "%s @ %s Odds: %s " % (game.awayteam, game.hometeam, game.odds)
+        odds = self.odds.get(game.id)
+        if odds is not None:
+            # Cached
+            print("Retrieved cached odds for %s" % game.id)
+            return "%s @ %s Odds: %s " % (game.awayteam, game.hometeam, odds)
+        return None
+
+    def cachedReply(self, command, game, render):
+        '''Return render()'s reply, rendered once per game version and reply_ttl.'''
+        if game.version is None:
+            return render()
+        key = (command, game.id, game.version)
+        reply = self.replies.get(key)
+        if reply is None:
+            reply = render()
+            if reply is not None:
+                self.replies.put(key, reply)
+        return reply
+
+    def reply(self, msg, text):
+        '''Reply to msg, unless the same text just went to the same place.'''
+        if self.replies.repeated(msg.channel or msg.sender.nick.lower(), text):
+            print("Repeated reply suppressed (%d so far)" % self.replies.suppressed)
+            return
+        msg.reply(text)
 
     @keyword("whatson")
+    @throttled
     def whatson(self, irc_c, msg, trigger, args, kargs):
         print("!whatson - %s" % msg.sender)
-        reply = "Games on TV: "
-        first = True
-        for gameid, game in self.fbs.items():
-            if game['status'] == GAME_STATUS_IN and "network" in game:
-                if first:
-                    first = False
-                else:
-                    reply += " | "
-                reply += self.getShortGameDesc(game)
-        if first == False:
-            irc_c.PRIVMSG(msg.sender.nick, reply)
+        descs = [self.getShortGameDesc(game) for game in self.views.get(VIEW_TV, self.games)]
+        if descs:
+            irc_c.PRIVMSG(msg.sender.nick, "Games on TV: " + " | ".join(descs))
         else:
             msg.reply("%s: No games are on TV right now. Sorry!" % (msg.sender.nick))
 
     @keyword("closegames")
+    @throttled
     def closegames(self, irc_c, msg, trigger, args, kargs):
         print("!closegames - %s" % msg.sender)
-        reply = "Close Games: "
-        first = True
-        for gameid, game in self.fbs.items():
-            diff = abs(game['homescore'] - game['awayscore'])
-            if game['status'] == GAME_STATUS_IN and diff <= 10:
-                if first:
-                    first = False
-                else:
-                    reply += " | "
-                reply += self.getShortGameDesc(game)
-        irc_c.PRIVMSG(msg.sender.nick, reply)
-
-    def announceScore(self, irc_c, game, chgHome = 0, chgAway = 0, endhalf=False, prefix =""):
-        msg = prefix + self.getLongGameDesc(game, chgHome, chgAway, endhalf=endhalf)
-        if msg in self.recentAnnounce:
-            print("Redundant score announcement suppressed: " + msg)
+        descs = [self.getShortGameDesc(game) for game in self.views.get(VIEW_CLOSE, self.games)]
+        irc_c.PRIVMSG(msg.sender.nick, "Close Games: " + " | ".join(descs))
+
+    @keyword("upcoming")
+    @throttled
+    def upcoming(self, irc_c, msg, trigger, args, kargs):
+        print("!upcoming - %s" % msg.sender)
+        descs = [self.getShortGameDesc(game)
+                 for game in self.views.get(VIEW_UPCOMING, self.games, self.listLimit)]
+        if descs:
+            irc_c.PRIVMSG(msg.sender.nick, "Next Kickoffs: " + " | ".join(descs))
+        else:
+            msg.reply("%s: No games are scheduled right now." % (msg.sender.nick))
+
+    @keyword("ranked")
+    @throttled
+    def ranked(self, irc_c, msg, trigger, args, kargs):
+        print("!ranked - %s" % msg.sender)
+        descs = [self.getShortGameDesc(game)
+                 for game in self.views.get(VIEW_RANKED, self.games, self.listLimit)]
+        if descs:
+            irc_c.PRIVMSG(msg.sender.nick, "Top 25 Games: " + " | ".join(descs))
+        else:
+            msg.reply("%s: No top 25 teams are playing right now." % (msg.sender.nick))
+
+    @keyword("follow")
+    @throttled
+    def follow(self, irc_c, msg, trigger, args, kargs):
+        nick = msg.sender.nick
+        team = ' '.join(args).lower()
+        print("!follow - %s - %s" % (msg.sender, team))
+        if not team:
+            following = self.follows.teams(nick)
+            if following:
+                msg.reply("%s: You follow %s." % (nick, ", ".join(following)))
+            else:
+                msg.reply("%s: You don't follow any teams. Try !follow <team>." % nick)
+            return
+        found = self.teams.team(team)
+        if found is None:
+            msg.reply("%s: Can't find that team (%s)." % (nick, self.teams.resolve(team)))
+            return
+        name, teamID = found
+        if self.follows.follow(nick, name, teamID):
+            msg.reply("%s: Following %s. Score updates will come by PM." % (nick, name))
+        elif self.follows.follows(nick, name, teamID):
+            msg.reply("%s: You already follow %s." % (nick, name))
+        else:
+            msg.reply("%s: You can follow at most %d teams." % (nick, self.follows.limit))
+
+    @keyword("unfollow")
+    @throttled
+    def unfollow(self, irc_c, msg, trigger, args, kargs):
+        nick = msg.sender.nick
+        team = ' '.join(args).lower()
+        print("!unfollow - %s - %s" % (msg.sender, team))
+        if not team or team == "all":
+            following = self.follows.teams(nick)
+            if self.follows.unfollow(nick):
+                msg.reply("%s: Stopped following %s." % (nick, ", ".join(following)))
+            else:
+                msg.reply("%s: You don't follow any teams." % nick)
+            return
+        found = self.teams.team(team)
+        name, teamID = found if found is not None else (self.teams.resolve(team), None)
+        if self.follows.unfollow(nick, name, teamID):
+            msg.reply("%s: Stopped following %s." % (nick, name))
+        else:
+            msg.reply("%s: You don't follow %s." % (nick, name))
+
+    def announceScore(self, irc_c, game, chgHome = 0, chgAway = 0, endhalf=False, prefix ="", kind=None,
+                      priority=PRIORITY_UPDATE):
+        # Suppress repeats of the same event at the same score, however it's worded
+        key = (game.id, kind, game.status, game.awayscore, game.homescore)
+        if self.recentAnnounce.check(key):
+            print("Redundant score announcement suppressed (%d so far): %s"
+                  % (self.recentAnnounce.suppressed, key))
             return
+        msg = prefix + self.getLongGameDesc(game, chgHome, chgAway, endhalf=endhalf)
         print("Score announcement: " + msg)
-        self.recentAnnounce.appendleft(msg)
-        for channel in self.config.live_chans:
-            irc_c.PRIVMSG(channel, msg)
+        for channel in self.router.targets(game):
+            # Queued per game, so a newer update replaces one still waiting
+            self.outbox.put(channel, msg, priority, key=game.id,
+                            batchable=priority != PRIORITY_SCORE, since=self.lastUpdate)
+        # Followers of either team get it by PM, behind the channels
+        followers = self.follows.followers(game)
+        for nick in followers:
+            self.outbox.put(nick, msg, PRIORITY_UPDATE, key=game.id, batchable=True, since=self.lastUpdate)
+        if followers:
+            self.metrics.incr('follow_messages', len(followers))
 
     def getShortGameDesc(self, game):
-        if game['status'] == GAME_STATUS_PRE:
-            output = "%s @ %s - %s" % (game['awayabv'], game['homeabv'],
-                                       game['time'])
-            if "network" in game:
-                output += " (%s)" % game['network']
-            return output
-        elif game['status'] == GAME_STATUS_IN:
-            output = "%s %d @ %s %d - %s" % (game['awayabv'], game['awayscore'],
-                                             game['homeabv'], game['homescore'],
-                                             game['time'])
-            if "network" in game:
-                output += " (%s)" % game['network']
-            return output
-        else:
-            output = "%s %d @ %s %d - %s" % (game['awayabv'], game['awayscore'],
-                                             game['homeabv'], game['homescore'],
-                                             game['time'])
-            return output
+        return self.renderer.short(game)
 
     def getLongGameDesc(self, game, chgHome = 0, chgAway = 0, endhalf=False):
-        output = ""
-        if game['status'] == GAME_STATUS_PRE:
-            output += "%s @ %s - %s - %s" % (bold(game['awayteam']), bold(game['hometeam']),
-                                            convertDateToEastern(game['date']),
-                                            game['location'])
-            if "network" in game:
-                output += " [TV: %s]" % game['network']
-        elif game['status'] == GAME_STATUS_POST:
-            output += "%s %d @ %s %d - %s" % (bold(game['awayteam']), game['awayscore'],
-                                              bold(game['hometeam']), game['homescore'],
-                                              game['time'])
-        elif game['status'] == GAME_STATUS_IN:
-            halftime = "Halftime" in game['time']
-            output += "%s %d" % (bold(game['awayteam']), game['awayscore'])
-            if "possess" in game and game['possess'] == "away":
-                output += " <-"
-            output += " @"
-            if "possess" in game and game['possess'] == "home":
-                output += " ->"
-            output += " %s %d" % (bold(game['hometeam']), game['homescore'])
-
-            output += " - %s" % game['time']
-
-            if chgHome > 0 and chgAway == 0:
-                sDesc = self.getScoringDesc(chgHome)
-                if sDesc is not None:
-                    output += " | %s" % underline(game['hometeam'] + " " + sDesc)
-            if chgHome == 0 and chgAway > 0:
-                sDesc = self.getScoringDesc(chgAway)
-                if sDesc is not None:
-                    output += " - %s" % underline(game['awayteam'] + " " + sDesc)
-            elif chgHome == 0 and chgAway == 0 and not halftime:
-                if "down" in game:
-                    output += " | %s" % game['down']
-                if "lastplay" in game and not endhalf:
-                    output += " (Last play: %s)" % game['lastplay']
-
-            if halftime and game['id'] in self.halftimes:
-                # Estimate time remaining for halftime
-                htimeleft = 1200 - int(time.time() - self.halftimes[game['id']])
-                if htimeleft < 0:
-                    htimeleft = 0
-                hm, hs = divmod(htimeleft, 60)
-                output += " (Est. time left: %02d:%02d)" % (hm, hs)
-
-            if "network" in game:
-                output += " [TV: %s]" % game['network']
-
-        return output
-
-    #def getGames(self, league="fbs"):
-    #    with open('data.json') as data_file:
-    #        return json.load(data_file)
-
-    # Primary magic happens here
+        detail = self.details.get(game.id) if self.details is not None else None
+        return self.renderer.long(game, chgHome, chgAway, endhalf, detail)
+
+    # Returns (games, response); games is None if the scoreboard hasn't changed
+    # since the last fetch applyScores committed. Set record_dir to save every new payload for benchmarks/replay.py.
     def getGames(self, league="fbs"):
-        type = "80" # 80 = FBS
-        if league == "fcs":
-            type = "81"
-        # Other leagues go here
-
-        req = Request("http://espn.go.com/college-football/scoreboard/_/group/" +
-                      type + "/year/2017/seasontype/2/?t=" + str(time.time()))
-        req.headers["User-Agent"] = self.ua
         # Load data
-        scoreData = urlopen(req).read().decode("utf-8")
-        scoreData = scoreData[scoreData.find('window.espn.scoreboardData 	= ')+len('window.espn.scoreboardData 	= '):]
-        scoreData = json.loads(scoreData[:scoreData.find('};')+1])
-
-        games = dict()
-
-        for event in scoreData['events']:
-            game = dict()
-
-            game["date"] = event['date']
-            status = event['status']['type']['state']
-            if status == "pre":
-                game['status'] = GAME_STATUS_PRE
-            elif status == "in":
-                game['status'] = GAME_STATUS_IN
-            else:
-                game['status'] = GAME_STATUS_POST
-            team1 = html.unescape(event['competitions'][0]['competitors'][0]['team']['location'])
-            tid1 = event['competitions'][0]['competitors'][0]['id']
-            score1 = int(event['competitions'][0]['competitors'][0]['score'])
-            team1abv = event['competitions'][0]['competitors'][0]['team']['abbreviation']
-            team2 = html.unescape(event['competitions'][0]['competitors'][1]['team']['location'])
-            tid2 = event['competitions'][0]['competitors'][1]['id']
-            score2 = int(event['competitions'][0]['competitors'][1]['score'])
-            team2abv = event['competitions'][0]['competitors'][1]['team']['abbreviation']
-
-            # Hawaii workaround
-            if team1 == "Hawai'i":
-                team1 = "Hawaii"
-            if team2 == "Hawai'i":
-                team2 = "Hawaii"
-
-            homestatus = event['competitions'][0]['competitors'][0]['homeAway']
-
-            if homestatus == 'home':
-                game['hometeam'], game['homeid'], game['homeabv'], game['homescore'], game['awayteam'], game['awayid'], game['awayabv'], game['awayscore'] =\
-                    team1, tid1, team1abv, score1, team2, tid2, team2abv, score2
-            else:
-                game['hometeam'], game['homeid'], game['homeabv'], game['homescore'], game['awayteam'], game['awayid'], game['awayabv'], game['awayscore'] = \
-                    team2, tid2, team2abv, score2, team1, tid1, team1abv, score1
-
-            game['time'] = event['status']['type']['shortDetail']
-            try:
-                game['network'] = event['competitions'][0]['broadcasts'][0]['names'][0]
-            except:
-                pass
-            try:
-                game['down'] = event['competitions'][0]['situation']['downDistanceText']
-            except:
-                pass
-            try:
-                possessor = event['competitions'][0]['situation']['possession']
-                if possessor == game['awayid']:
-                    game['possess'] = "away"
-                else:
-                    game['possess'] = "home"
-            except:
-                pass
-            try:
-                game['lastplay'] = event['competitions'][0]['situation']['lastPlay']['text']
-            except:
-                pass
-            game['location'] = event['competitions'][0]['venue']['address']['city']
-            try:
-                game['location'] += ", " + event['competitions'][0]['venue']['address']['state']
-            except:
-                pass
-
-            try:
-                game['odds'] = event['competitions'][0]['odds'][0]['details']
-                game['odds'] += " (O/U: %s)" % event['competitions'][0]['odds'][0]['overUnder']
-            except:
-                pass
-
-
-            gid = event['id']
-            game['id'] = gid # Redundant but useful when passing game objects around.
-            games[gid] = game
-        return games
+        with self.metrics.timer('fetch'):
+            resp = self.source.fetch(league)
+        self.metrics.incr('bytes_downloaded', resp.wireBytes)
+        if resp.notModified:
+            self.metrics.incr('not_modified')
+            return None, resp
+        if self.recorder is not None:
+            self.recorder.record(league, resp.body)
+        with self.metrics.timer('extract'):
+            scoreData = self.source.decode(resp.body)
+        with self.metrics.timer('parse'):
+            games = self.parseGames(scoreData, league)
+        self.metrics.incr('games_parsed', len(games))
+        return games, resp
+
+    def parseGames(self, scoreData, league):
+        return parseScoreboard(scoreData, league)
@@ -0,0 +1,235 @@
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fbbot.details import DetailFetcher
+from fbbot.game import Game, GAME_STATUS_IN, GAME_STATUS_POST
+from fbbot.httpclient import HttpClient
+
+
+class StandIn(ThreadingMixIn, HTTPServer):
+    '''A local stand-in for ESPN's summary API. Each game's summary can be
+    changed, made to fail with a 503, and held until the gate opens.
+    Unchanged summaries are answered with a 304.'''
+
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), SummaryHandler)
+        self.lock = threading.Lock()
+        self.gate = threading.Event()
+        self.gate.set()
+        self.drives = {}
+        self.failing = set()
+        self.hits = 0
+        self.notModified = 0
+        self.active = 0
+        self.maxActive = 0
+
+    def url(self):
+        return "http://127.0.0.1:%d/summary?event=%%s" % self.server_address[1]
+
+
+class SummaryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        gameID = parse_qs(urlsplit(self.path).query)['event'][0]
+        with server.lock:
+            server.hits += 1
+            server.active += 1
+            server.maxActive = max(server.maxActive, server.active)
+        try:
+            server.gate.wait(10)
+            time.sleep(0.02)
+            with server.lock:
+                failing = gameID in server.failing
+                drive = server.drives.get(gameID, "1 play, 5 yards, 0:30")
+        finally:
+            with server.lock:
+                server.active -= 1
+        etag = '"%s"' % abs(hash(drive))
+        if failing:
+            self.reply(503, b"unavailable")
+        elif self.headers.get('If-None-Match') == etag:
+            with server.lock:
+                server.notModified += 1
+            self.reply(304, b"")
+        else:
+            body = json.dumps({'drives': {'current': {
+                'description': drive, 'team': {'abbreviation': "T" + gameID},
+                'plays': [{'text': "Last play of %s" % gameID}]}}}).encode()
+            self.reply(200, body, etag)
+
+    def reply(self, status, body, etag=None):
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def makeGame(gameID, status=GAME_STATUS_IN, homescore=14, awayscore=10):
+    return Game(gameID, "fbs", "2017-10-07T16:00Z", status, "5:00 - 2nd", "Somewhere, ST",
+                "Home " + gameID, "1" + gameID, "H" + gameID, homescore,
+                "Away " + gameID, "2" + gameID, "A" + gameID, awayscore)
+
+
+def makeGames(count):
+    return dict((str(n), makeGame(str(n))) for n in range(count))
+
+
+class DetailFetcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandIn()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.fetchers = []
+
+    def tearDown(self):
+        self.server.gate.set()
+        for fetcher in self.fetchers:
+            fetcher.shutdown()
+            fetcher.http.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def makeFetcher(self, **kwargs):
+        fetcher = DetailFetcher(HttpClient(timeout=5), url=self.server.url(), **kwargs)
+        self.fetchers.append(fetcher)
+        return fetcher
+
+    def waitFor(self, condition, timeout=5):
+        deadline = time.time() + timeout
+        while not condition():
+            if time.time() > deadline:
+                self.fail("Timed out waiting for the fetcher")
+            time.sleep(0.01)
+
+    def idle(self, fetcher):
+        return lambda: not fetcher.inflight and not fetcher.queue
+
+    def testFetchesEveryLiveGameWithinWorkerBound(self):
+        fetcher = self.makeFetcher(workers=3, ttl=60)
+        games = makeGames(10)
+        games['9'] = makeGame('9', status=GAME_STATUS_POST)
+        started = time.time()
+        self.assertEqual(fetcher.update(games), 3)
+        self.assertLess(time.time() - started, 0.05)
+        self.assertEqual(len(fetcher.inflight), 3)
+        self.assertEqual(len(fetcher.queue), 6)
+
+        self.waitFor(self.idle(fetcher))
+        self.assertLessEqual(self.server.maxActive, 3)
+        self.assertEqual(self.server.hits, 9)
+        self.assertEqual(fetcher.fetched, 9)
+        for gameID in games:
+            if gameID == '9':
+                self.assertIsNone(fetcher.get(gameID))
+            else:
+                detail = fetcher.get(gameID)
+                self.assertEqual(detail.drive, "1 play, 5 yards, 0:30")
+                self.assertEqual(detail.team, "T" + gameID)
+                self.assertEqual(detail.play, "Last play of " + gameID)
+
+    def testMarginSkipsLopsidedGames(self):
+        fetcher = self.makeFetcher(workers=2, margin=8)
+        games = {'1': makeGame('1', homescore=14, awayscore=10),
+                 '2': makeGame('2', homescore=42, awayscore=0)}
+        fetcher.update(games)
+        self.waitFor(self.idle(fetcher))
+        self.assertIsNotNone(fetcher.get('1'))
+        self.assertIsNone(fetcher.get('2'))
+        self.assertEqual(self.server.hits, 1)
+
+    def testRefreshesOnlyAfterTTL(self):
+        fetcher = self.makeFetcher(workers=2, ttl=0.3)
+        games = makeGames(1)
+        fetcher.update(games)
+        self.waitFor(self.idle(fetcher))
+        first = fetcher.get('0')
+
+        self.server.drives['0'] = "6 plays, 40 yards, 2:10"
+        self.assertEqual(fetcher.update(games), 0)
+        self.assertEqual(self.server.hits, 1)
+        self.assertIs(fetcher.get('0'), first)
+
+        time.sleep(0.3)
+        self.assertEqual(fetcher.update(games), 1)
+        self.waitFor(self.idle(fetcher))
+        self.assertEqual(self.server.hits, 2)
+        self.assertEqual(fetcher.get('0').drive, "6 plays, 40 yards, 2:10")
+
+    def testKeepsDetailWhenUnchangedOrFailing(self):
+        fetcher = self.makeFetcher(workers=2, ttl=0.2)
+        games = makeGames(1)
+        fetcher.update(games)
+        self.waitFor(self.idle(fetcher))
+        first = fetcher.get('0')
+
+        # 304: same drive, new timestamp so it isn't refetched straight away
+        time.sleep(0.2)
+        fetcher.update(games)
+        self.waitFor(self.idle(fetcher))
+        unchanged = fetcher.get('0')
+        self.assertEqual(self.server.hits, 2)
+        self.assertEqual(self.server.notModified, 1)
+        self.assertEqual(unchanged.drive, first.drive)
+        self.assertGreater(unchanged.fetched, first.fetched)
+        self.assertEqual(fetcher.errors, 0)
+
+        # 503: the old drive is kept and the error counted
+        self.server.failing.add('0')
+        time.sleep(0.2)
+        fetcher.update(games)
+        self.waitFor(self.idle(fetcher))
+        failed = fetcher.get('0')
+        self.assertEqual(self.server.hits, 3)
+        self.assertEqual(failed.drive, first.drive)
+        self.assertEqual(failed.play, first.play)
+        self.assertGreater(failed.fetched, unchanged.fetched)
+        self.assertEqual(fetcher.errors, 1)
+
+    def testCancelsGamesThatEnd(self):
+        fetcher = self.makeFetcher(workers=2, ttl=60)
+        games = makeGames(4)
+        self.server.gate.clear()
+        fetcher.update(games)
+        self.waitFor(lambda: self.server.active == 2)
+        self.assertEqual(sorted(fetcher.queue), ['2', '3'])
+
+        # Game 0 ends mid-fetch, game 2 ends while still queued
+        games['0'] = makeGame('0', status=GAME_STATUS_POST)
+        games['2'] = makeGame('2', status=GAME_STATUS_POST)
+        fetcher.update(games)
+        self.assertNotIn('0', fetcher.inflight)
+        self.assertNotIn('2', fetcher.queue)
+        self.assertEqual(fetcher.cancelled, 1)
+
+        self.server.gate.set()
+        self.waitFor(self.idle(fetcher))
+        self.assertIsNone(fetcher.get('0'))
+        self.assertIsNone(fetcher.get('2'))
+        self.assertIsNotNone(fetcher.get('1'))
+        self.assertIsNotNone(fetcher.get('3'))
+
+        fetcher.cancel('1')
+        self.assertIsNone(fetcher.get('1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import json
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fbbot.extract import ExtractError, findObject, extractJson, extractScoreboard
+
+PREFIX = b'<script>window.espn.scoreboardData \t= '
+
+
+def page(obj, tail=b';window.espn.other = {};</script>'):
+    return PREFIX + json.dumps(obj).encode('utf-8') + tail
+
+
+class FindObjectTest(unittest.TestCase):
+
+    def testBracesAndEscapesInStrings(self):
+        obj = {'events': [{'text': 'a } b { c "};" d \\" e \\\\'}], 'n': {'m': {}}}
+        data = page(obj)
+        start, end = findObject(data)
+        self.assertEqual(json.loads(data[start:end].decode('utf-8')), obj)
+        self.assertEqual(extractScoreboard(data), obj)
+
+    def testTruncatedPagesFailFast(self):
+        # Used to backtrack exponentially in the length of the tail
+        cases = [b'{"a": [1,2' + b'x' * 100000,
+                 b'{"a": "unterminated string' + b'x' * 100000,
+                 b'{"a": {"b": {}}' + b' ' * 100000,
+                 b'{"a": "\\' + b'"' * 100000]
+        for case in cases:
+            started = time.time()
+            with self.assertRaises(ExtractError):
+                findObject(PREFIX + case)
+            with self.assertRaises(ExtractError):
+                extractJson(PREFIX + case)
+            self.assertLess(time.time() - started, 1.0)
+
+    def testMissingMarker(self):
+        with self.assertRaises(ExtractError):
+            findObject(b'<html>no scores here</html>')
+        with self.assertRaises(ExtractError):
+            findObject(PREFIX + b'[1, 2]')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fbbot.game import Game, GAME_STATUS_PRE, GAME_STATUS_IN, GAME_STATUS_POST
+from fbbot.gamediff import (GameDiff, EVENT_STATUS, EVENT_SCORE, EVENT_HALFTIME_START,
+                            EVENT_HALFTIME_END, EVENT_POSSESSION, EVENT_ODDS)
+
+
+def makeGame(gameID="1", status=GAME_STATUS_IN, clock="10:00 - 1st", homescore=0, awayscore=0,
+             possess=None, odds=None):
+    return Game(gameID, "fbs", "2017-10-07T16:00Z", status, clock, "Auburn, AL",
+                "Auburn", "2", "AUB", homescore, "Georgia", "61", "UGA", awayscore,
+                network="CBS", possess=possess, odds=odds)
+
+
+class GameDiffTest(unittest.TestCase):
+
+    def setUp(self):
+        self.gamediff = GameDiff()
+
+    def poll(self, old, new):
+        '''Diff two boards of one game each; returns the event kinds.'''
+        oldGames = {old.id: old} if old is not None else {}
+        return [ev.kind for ev in self.gamediff.diff(oldGames, {new.id: new})]
+
+    def step(self, old, new):
+        '''Show GameDiff old on a first poll, then diff it against new.'''
+        self.poll(None, old)
+        return self.poll(old, new)
+
+    def testFirstSightingOnlyReportsOdds(self):
+        self.assertEqual(self.poll(None, makeGame(homescore=7, possess="2")), [])
+        self.gamediff.reset()
+        self.assertEqual(self.poll(None, makeGame("2", odds="AUB -3")), [EVENT_ODDS])
+
+    def testUnchangedGamesAreSkipped(self):
+        old = makeGame(homescore=7)
+        self.poll(None, old)
+        version = old.version
+        new = makeGame(homescore=7)
+        self.assertEqual(self.poll(old, new), [])
+        self.assertEqual(new.version, version)
+
+        changed = makeGame(homescore=14)
+        self.assertEqual(self.poll(new, changed), [EVENT_SCORE])
+        self.assertNotEqual(changed.version, version)
+
+    def testStatusChangeIsTheOnlyEvent(self):
+        old = makeGame(status=GAME_STATUS_PRE, clock="Sat, October 7th at 12:00 PM EDT")
+        new = makeGame(status=GAME_STATUS_IN, homescore=7, possess="2")
+        self.assertEqual(self.step(old, new), [EVENT_STATUS])
+
+        old = makeGame(clock="0:00 - 4th", homescore=7)
+        new = makeGame(status=GAME_STATUS_POST, clock="Final", homescore=10)
+        self.assertEqual(self.step(old, new), [EVENT_STATUS])
+
+    def testHalftime(self):
+        old = makeGame(clock="0:00 - 2nd")
+        half = makeGame(clock="Halftime")
+        self.assertEqual(self.step(old, half), [EVENT_HALFTIME_START])
+        after = makeGame(clock="15:00 - 3rd")
+        self.assertEqual(self.poll(half, after), [EVENT_HALFTIME_END])
+
+    def testScoreDeltas(self):
+        old = makeGame(homescore=7, awayscore=3)
+        new = makeGame(homescore=14, awayscore=3)
+        events = self.gamediff.diff({}, {old.id: old}) + self.gamediff.diff({old.id: old}, {new.id: new})
+        self.assertEqual([ev.kind for ev in events], [EVENT_SCORE])
+        self.assertEqual((events[0].chgHome, events[0].chgAway), (7, 0))
+        self.assertIs(events[0].old, old)
+
+        # A score taken away isn't announced
+        fixed = makeGame(homescore=8, awayscore=3)
+        self.assertEqual(self.poll(new, fixed), [])
+
+    def testPossessionAndOddsChanges(self):
+        old = makeGame(possess="2", odds="AUB -3")
+        new = makeGame(possess="61", odds="AUB -3")
+        self.assertEqual(self.step(old, new), [EVENT_POSSESSION])
+        moved = makeGame(possess="61", odds="AUB -1")
+        self.assertEqual(self.poll(new, moved), [EVENT_ODDS])
+
+    def testPrimeProducesNoEvents(self):
+        old = makeGame(homescore=7)
+        self.gamediff.prime({old.id: old})
+        self.assertIsNotNone(old.version)
+        same = makeGame(homescore=7)
+        self.assertEqual(self.poll(old, same), [])
+        self.assertEqual(same.version, old.version)
+
+
+if __name__ == '__main__':
+    unittest.main()
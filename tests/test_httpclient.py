@@ -0,0 +1,119 @@
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fbbot.httpclient import HttpClient
+
+
+class StandIn(ThreadingMixIn, HTTPServer):
+    '''Answers every GET with a short body after delay seconds. With
+    dropIdle set it hangs up after each response while still claiming
+    keep-alive, so the client pools a connection that is already dead.'''
+
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), Handler)
+        self.lock = threading.Lock()
+        self.delay = 0
+        self.dropIdle = False
+        self.hits = 0
+
+    def url(self):
+        return "http://127.0.0.1:%d/scoreboard" % self.server_address[1]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.hits += 1
+        time.sleep(self.server.delay)
+        body = b"{}"
+        try:
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                body = b""
+            else:
+                self.send_response(200)
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            # The client gave up waiting
+            pass
+        if self.server.dropIdle:
+            self.close_connection = True
+
+
+class HttpClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandIn()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def testReusesConnections(self):
+        http = HttpClient(timeout=5)
+        for _ in range(3):
+            self.assertEqual(http.get(self.server.url()).status, 200)
+        self.assertEqual(self.server.hits, 3)
+        self.assertEqual(sum(len(conns) for conns in http._idle.values()), 1)
+        http.close()
+
+    def testValidatorsRememberedOnCommit(self):
+        http = HttpClient(timeout=5)
+        first = http.get(self.server.url())
+        self.assertEqual(first.body, b"{}")
+        # Not committed, e.g. the body failed to parse: fetch it in full again
+        second = http.get(self.server.url())
+        self.assertEqual(second.status, 200)
+        self.assertFalse(second.notModified)
+        self.assertEqual(second.body, b"{}")
+        http.commit(second)
+        third = http.get(self.server.url())
+        self.assertEqual(third.status, 304)
+        self.assertTrue(third.notModified)
+        http.close()
+
+    def testRetriesStalePooledConnection(self):
+        self.server.dropIdle = True
+        http = HttpClient(timeout=5)
+        self.assertEqual(http.get(self.server.url()).status, 200)
+        time.sleep(0.05)
+        self.assertEqual(http.get(self.server.url()).status, 200)
+        self.assertEqual(self.server.hits, 2)
+        http.close()
+
+    def testTimeoutIsNotRetried(self):
+        self.server.delay = 0.5
+        http = HttpClient(timeout=0.2)
+        started = time.time()
+        self.assertRaises(socket.timeout, http.get, self.server.url())
+        self.assertLess(time.time() - started, 0.35)
+        self.assertEqual(self.server.hits, 1)
+        http.close()
+
+    def testFreshConnectionFailureIsNotRetried(self):
+        self.server.server_close()
+        http = HttpClient(timeout=1)
+        self.assertRaises(OSError, http.get, self.server.url())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fbbot.thirdparty import pickledb
+
+
+class SlowCompactDB(pickledb.pickledb):
+    '''Holds compaction's snapshot write until release is set.'''
+
+    def __init__(self, *args, **kwargs):
+        self.writing = threading.Event()
+        self.release = threading.Event()
+        pickledb.pickledb.__init__(self, *args, **kwargs)
+
+    def _write(self, data):
+        self.writing.set()
+        self.release.wait(5)
+        pickledb.pickledb._write(self, data)
+
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'test.db')
+        self.journal = self.path + '.journal'
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def open(self, compact_size=pickledb.COMPACT_SIZE):
+        return pickledb.load(self.path, True, journal=True, compact_size=compact_size)
+
+    def reopened(self):
+        db = self.open()
+        data = db.getall()
+        db.close()
+        return dict((key, db.get(key)) for key in data)
+
+    def testReplaysJournal(self):
+        db = self.open()
+        db.set('a', 1)
+        db.dcreate('d')
+        db.dadd('d', ('x', [1, 2]))
+        db.lcreate('l')
+        db.lextend('l', [1, 2, 3])
+        db.lpop('l', 0)
+        db.set('b', 2)
+        db.rem('b')
+        db.close()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(self.reopened(), {'a': 1, 'd': {'x': [1, 2]}, 'l': [2, 3]})
+
+    def testTornRecordIsCutOff(self):
+        db = self.open()
+        db.set('a', 1)
+        db.set('b', 2)
+        db.close()
+        with open(self.journal, 'at') as f:
+            f.write('["set", "c", ')
+
+        db = self.open()
+        self.assertIsNone(db.get('c'))
+        db.set('d', 4)
+        db.set('e', 5)
+        db.close()
+        self.assertEqual(self.reopened(), {'a': 1, 'b': 2, 'd': 4, 'e': 5})
+
+    def testRecordWithoutNewlineIsTorn(self):
+        db = self.open()
+        db.set('a', 1)
+        db.close()
+        with open(self.journal, 'at') as f:
+            f.write('["set", "b", 2]')
+
+        db = self.open()
+        db.set('c', 3)
+        db.close()
+        self.assertEqual(self.reopened(), {'a': 1, 'c': 3})
+
+    def testCompaction(self):
+        db = self.open(compact_size=200)
+        for n in range(50):
+            db.set('key%d' % n, n)
+        db.close()
+        self.assertTrue(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(self.journal + '.compacting'))
+        self.assertEqual(self.reopened(), dict(('key%d' % n, n) for n in range(50)))
+
+    def testDumpFoldsJournalIntoFile(self):
+        db = self.open()
+        db.set('a', 1)
+        db.dump()
+        self.assertFalse(os.path.exists(self.journal))
+        db.set('b', 2)
+        db.close()
+        self.assertEqual(self.reopened(), {'a': 1, 'b': 2})
+
+    def testReopenDuringCompaction(self):
+        db = SlowCompactDB(self.path, True, journal=True, compact_size=100)
+        for n in range(10):
+            db.set('key%d' % n, n)
+        self.assertTrue(db.writing.wait(5))
+        db.set('late', True)
+        # The snapshot hasn't been written; the records are still in the journals
+        try:
+            self.assertEqual(self.reopened(), dict([('key%d' % n, n) for n in range(10)] + [('late', True)]))
+        finally:
+            db.release.set()
+            db.close()
+        self.assertEqual(self.reopened(), dict([('key%d' % n, n) for n in range(10)] + [('late', True)]))
+
+    def testRecoverDiscardsUnfinishedSnapshot(self):
+        db = self.open()
+        db.set('a', 1)
+        db.dump()
+        db.set('b', 2)
+        db.close()
+        # Crashed while writing the snapshot: the rotated journal is still there
+        os.replace(self.journal, self.journal + '.compacting')
+        with open(self.path + '.tmp', 'wt') as f:
+            f.write('{"a": ')
+        self.assertEqual(self.reopened(), {'a': 1, 'b': 2})
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def testRecoverFinishesCompleteSnapshot(self):
+        db = self.open()
+        db.set('a', 1)
+        db.dump()
+        db.close()
+        # Crashed after removing the rotated journal but before the rename
+        with open(self.path + '.tmp', 'wt') as f:
+            f.write('{"a": 1, "b": 2}')
+        self.assertEqual(self.reopened(), {'a': 1, 'b': 2})
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+
+if __name__ == '__main__':
+    unittest.main()
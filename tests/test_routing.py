@@ -0,0 +1,105 @@
+import os
+import sys
+import unittest
+
+import yaml
+from pyaib.util.data import CaseInsensitiveObject
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fbbot.game import Game, GAME_STATUS_IN, GAME_STATUS_POST
+from fbbot.routing import Route, Router, parseRoutes
+from fbbot.teamindex import TeamIndex, foldAliases
+
+# The routes example from footballbot.conf
+CONFIG = '''
+plugin.cfbscores:
+    routes:
+        "#b1g":
+            conferences: [b1g]
+        "#huskers":
+            teams: [nebraska]
+        "#top25":
+            ranked: true
+        "#closegames":
+            close: 8
+'''
+
+
+def makeGame(clock, homescore, awayscore):
+    return Game("1", "fbs", "2017-10-07T16:00Z", GAME_STATUS_IN, clock, "Auburn, AL",
+                "Auburn", "2", "AUB", homescore, "Georgia", "61", "UGA", awayscore,
+                homeconf="8", awayconf="8")
+
+
+def makeBigTenGame(status, clock):
+    return Game("2", "fbs", "2017-10-07T16:00Z", status, clock, "Lincoln, NE",
+                "Nebraska", "158", "NEB", 21, "Iowa", "2294", "IOWA", 17,
+                homerank=20, homeconf="5", awayconf="5")
+
+
+def makeUConnGame(gameID="3"):
+    return Game(gameID, "fbs", "2017-10-07T16:00Z", GAME_STATUS_IN, "5:00 - 2nd", "East Hartford, CT",
+                "UConn", "41", "UCONN", 7, "Memphis", "235", "MEM", 31, homeconf="151", awayconf="151")
+
+
+class RouterTest(unittest.TestCase):
+
+    def parseConfig(self):
+        # pyaib hands plugins their config as CaseInsensitiveObjects
+        config = CaseInsensitiveObject(yaml.safe_load(CONFIG))['plugin.cfbscores']
+        teams = TeamIndex(foldAliases({"Nebraska": ["huskers", "neb"]}))
+        return [Route("#live")] + parseRoutes(config.get('routes', {}), teams)
+
+    def testRoutesFromConfig(self):
+        routes = dict((route.channel, route) for route in self.parseConfig())
+        self.assertIsNone(routes["#b1g"].close)
+        self.assertIsNone(routes["#huskers"].close)
+        self.assertIsNone(routes["#top25"].close)
+        self.assertEqual(routes["#closegames"].close, 8)
+        self.assertEqual(routes["#b1g"].conferences, frozenset(["5"]))
+
+        router = Router(self.parseConfig())
+        self.assertEqual(router.targets(makeBigTenGame(GAME_STATUS_IN, "5:00 - 2nd")),
+                         ("#live", "#b1g", "#huskers", "#top25"))
+        router = Router(self.parseConfig())
+        self.assertEqual(router.targets(makeBigTenGame(GAME_STATUS_IN, "1:00 - 4th")),
+                         ("#live", "#b1g", "#huskers", "#top25", "#closegames"))
+        router = Router(self.parseConfig())
+        self.assertEqual(router.targets(makeBigTenGame(GAME_STATUS_POST, "Final")),
+                         ("#live", "#b1g", "#huskers", "#top25"))
+
+    def testCloseRoutesOnlyForCloseFinishes(self):
+        router = Router([Route("#live"), Route("#close", close=7)])
+        self.assertEqual(router.targets(makeGame("5:00 - 2nd", 14, 10)), ("#live",))
+        router = Router([Route("#live"), Route("#close", close=7)])
+        self.assertEqual(router.targets(makeGame("1:00 - 4th", 14, 10)), ("#live", "#close"))
+
+    def testChannelIsNotAnnouncedTwice(self):
+        router = Router([Route("#live", close=7), Route("#live"), Route("#sec", conferences=["8"]),
+                         Route("#close", close=7), Route("#close", close=3)])
+        self.assertEqual(router.targets(makeGame("1:00 - 4th", 14, 12)), ("#live", "#sec", "#close"))
+
+    def testTeamsSpelledDifferentlyThanESPN(self):
+        # abbrv.json calls UConn "connecticut"; ESPN calls it "UConn"
+        teams = TeamIndex(foldAliases({"connecticut": ["uconn", "conn"]}))
+        config = CaseInsensitiveObject({'#huskies': {'teams': ["uconn"]}})
+        router = Router(parseRoutes(config, teams))
+        # Before UConn has been on a board nothing links the two names
+        self.assertEqual(router.targets(makeUConnGame()), ())
+
+        # Once the game is on the board the route knows ESPN's name and ID
+        games = {"3": makeUConnGame()}
+        teams.rebuild(games)
+        router.learn(teams)
+        self.assertEqual(router.routes[0].teamIDs, frozenset(["41"]))
+        self.assertEqual(router.targets(makeUConnGame()), ("#huskies",))
+
+        # ... and still matches by ID after UConn has left the board
+        teams.rebuild({})
+        router.learn(teams)
+        self.assertEqual(router.targets(makeUConnGame("4")), ("#huskies",))
+
+
+if __name__ == '__main__':
+    unittest.main()
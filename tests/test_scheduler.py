@@ -0,0 +1,77 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fbbot.game import Game, GAME_STATUS_PRE, GAME_STATUS_IN, GAME_STATUS_POST
+from fbbot.scheduler import (PollScheduler, parseKickoff, isCloseFinish, SCHEDULE_CLOSE,
+                             SCHEDULE_LIVE, SCHEDULE_HALFTIME, SCHEDULE_KICKOFF, SCHEDULE_IDLE)
+
+KICKOFF = "2017-10-07T16:00Z"
+NOW = parseKickoff(KICKOFF)
+
+
+def makeGame(gameID, status, clock="10:00 - 1st", homescore=0, awayscore=0, date=KICKOFF):
+    return Game(gameID, "fbs", date, status, clock, "Auburn, AL",
+                "Auburn", "2", "AUB", homescore, "Georgia", "61", "UGA", awayscore)
+
+
+def board(*games):
+    return dict((game.id, game) for game in games)
+
+
+class PollSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = PollScheduler(liveFreq=20, closeFreq=10, halftimeFreq=60, idleFreq=60,
+                                       pregameWindow=600, maxSleep=3600, closeMargin=8)
+
+    def testParseKickoff(self):
+        self.assertEqual(parseKickoff("2017-10-07T16:00:00Z"), NOW)
+        self.assertRaises(ValueError, parseKickoff, "TBD")
+
+    def testCloseFinish(self):
+        self.assertTrue(isCloseFinish(makeGame("1", GAME_STATUS_IN, "2:00 - 4th", 21, 17), 8))
+        self.assertTrue(isCloseFinish(makeGame("1", GAME_STATUS_IN, "OT", 21, 21), 8))
+        self.assertFalse(isCloseFinish(makeGame("1", GAME_STATUS_IN, "2:00 - 4th", 35, 17), 8))
+        self.assertFalse(isCloseFinish(makeGame("1", GAME_STATUS_IN, "2:00 - 3rd", 21, 17), 8))
+        self.assertFalse(isCloseFinish(makeGame("1", GAME_STATUS_POST, "Final", 21, 17), 8))
+
+    def testLiveAndClose(self):
+        live = makeGame("1", GAME_STATUS_IN, "5:00 - 2nd")
+        close = makeGame("2", GAME_STATUS_IN, "2:00 - 4th", 21, 17)
+        self.assertEqual(self.scheduler.plan(board(live), NOW), (20, SCHEDULE_LIVE))
+        self.assertEqual(self.scheduler.plan(board(live, close), NOW), (10, SCHEDULE_CLOSE))
+
+    def testHalftimeBacksOff(self):
+        half = makeGame("1", GAME_STATUS_IN, "Halftime")
+        self.assertEqual(self.scheduler.plan(board(half), NOW), (60, SCHEDULE_HALFTIME))
+        # ... unless a kickoff is coming up
+        soon = makeGame("2", GAME_STATUS_PRE, date="2017-10-07T16:10Z")
+        self.assertEqual(self.scheduler.plan(board(half, soon), NOW), (20, SCHEDULE_HALFTIME))
+        # One game still playing means live polling
+        live = makeGame("3", GAME_STATUS_IN, "5:00 - 3rd")
+        self.assertEqual(self.scheduler.plan(board(half, live), NOW), (20, SCHEDULE_LIVE))
+
+    def testSleepsUntilKickoff(self):
+        later = makeGame("1", GAME_STATUS_PRE, date="2017-10-07T16:30Z")
+        self.assertEqual(self.scheduler.plan(board(later), NOW), (1200, SCHEDULE_IDLE))
+        self.assertEqual(self.scheduler.plan(board(later), NOW + 1200), (20, SCHEDULE_KICKOFF))
+        # Late getting started
+        self.assertEqual(self.scheduler.plan(board(later), NOW + 3600), (20, SCHEDULE_KICKOFF))
+
+        nextWeek = makeGame("2", GAME_STATUS_PRE, date="2017-10-14T16:00Z")
+        self.assertEqual(self.scheduler.plan(board(nextWeek), NOW), (3600, SCHEDULE_IDLE))
+        # Never shorter than idleFreq
+        self.assertEqual(self.scheduler.plan(board(later), NOW + 1170), (60, SCHEDULE_IDLE))
+
+    def testNothingScheduled(self):
+        final = makeGame("1", GAME_STATUS_POST, "Final")
+        tbd = makeGame("2", GAME_STATUS_PRE, date="TBD")
+        self.assertEqual(self.scheduler.plan(board(final, tbd), NOW), (3600, SCHEDULE_IDLE))
+        self.assertEqual(self.scheduler.plan({}, NOW), (3600, SCHEDULE_IDLE))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fbbot.game import Game, GAME_STATUS_IN
+from fbbot.teamindex import TeamIndex, foldAliases
+
+
+def makeGame(gameID, home, homeabv, away, awayabv):
+    return Game(gameID, "fcs", "2017-10-07T16:00Z", GAME_STATUS_IN, "5:00 - 2nd", "Somewhere, ST",
+                home, "1" + gameID, homeabv, 14, away, "2" + gameID, awayabv, 10)
+
+
+class TeamIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.teams = TeamIndex(foldAliases({"Auburn": ["aub", "war eagle"]}))
+
+    def testCorrectsTypos(self):
+        self.teams.rebuild({'1': makeGame('1', "Auburn", "AUB", "Georgia", "UGA")})
+        self.assertEqual(self.teams.find("aubrun"), '1')
+        self.assertEqual(self.teams.find("georiga"), '1')
+        self.assertIsNone(self.teams.find("nowhere state"))
+
+    def testTypoMatchesTeamThatReachesTheBoardLater(self):
+        self.teams.rebuild({'1': makeGame('1', "Auburn", "AUB", "Georgia", "UGA")})
+        self.assertIsNone(self.teams.find("stephen f austn"))
+        self.teams.rebuild({'1': makeGame('1', "Auburn", "AUB", "Georgia", "UGA"),
+                            '2': makeGame('2', "Stephen F Austin", "SFA", "Lamar", "LAM")})
+        self.assertEqual(self.teams.find("stephen f austn"), '2')
+
+
+if __name__ == '__main__':
+    unittest.main()